@@ -0,0 +1,142 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+from sqlalchemy import text
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.benchmarks.corpus import BRAND_PREFIX, make_corpus, make_queries
+from src.benchmarks.run import git_revision, peak_rss_mb
+from src.data.embedding_model import EMBEDDING_DIM
+from src.data.vector_store import create_vector_store
+
+
+def ids(results) -> List[List[str]]:
+    return [[med["id"] for med, _ in hits] for hits in results]
+
+
+def measure(vector_db, queries: List[str], limit: int, batch_size: int) -> Dict:
+    """Time the looped single-query search against the batch search"""
+    run_id = uuid.uuid4().hex[:8]
+    report = {"batch_size": batch_size, "queries": len(queries)}
+    for mode in ("loop", "batch"):
+        # Unique texts so the embedding cache cannot answer for either mode
+        texts = [f"{q} #{run_id}-{mode}-{i}" for i, q in enumerate(queries)]
+        start = time.perf_counter()
+        if mode == "loop":
+            for query in texts:
+                vector_db.find_similar_medications(query, limit, route_names=False)
+        else:
+            vector_db.find_similar_medications_batch(texts, limit, batch_size)
+        seconds = time.perf_counter() - start
+        report[mode] = {
+            "wall_seconds": round(seconds, 3),
+            "queries_per_second": round(len(texts) / seconds, 1) if seconds else 0.0,
+        }
+    report["speedup"] = (
+        round(report["loop"]["wall_seconds"] / report["batch"]["wall_seconds"], 2)
+        if report["batch"]["wall_seconds"]
+        else None
+    )
+
+    # Same texts, now embedded, to check both paths return the same rankings
+    looped = [
+        vector_db.find_similar_medications(q, limit, route_names=False) for q in queries
+    ]
+    batched = vector_db.find_similar_medications_batch(queries, limit, batch_size)
+    same = sum(a == b for a, b in zip(ids(looped), ids(batched)))
+    report["identical_rankings"] = round(same / len(queries), 4) if queries else 1.0
+    return report
+
+
+def main():
+    """Compare looped single-query search with batch search"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--corpus-size", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument(
+        "--vector-stores",
+        nargs="+",
+        choices=["pgvector", "numpy", "hnsw"],
+        default=["pgvector", "numpy"],
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--keep-corpus", action="store_true", help="leave synthetic rows in the DB"
+    )
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Reused near-duplicate results would flatter the looped search
+    os.environ["SEMANTIC_CACHE_MAX_DISTANCE"] = "0"
+    from src.context import AppContext
+
+    context = AppContext()
+    vector_db = context.vector_db
+    vector_db.warm_up()
+    corpus = make_corpus(args.corpus_size, args.seed)
+    queries = make_queries(args.queries, args.seed + 1)
+
+    results = []
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            vector_db.cache_medications(corpus)
+        for backend in args.vector_stores:
+            vector_db.vector_store.close()
+            vector_db.vector_store = create_vector_store(
+                EMBEDDING_DIM, vector_db.engine, backend
+            )
+            for batch_size in args.batch_sizes:
+                print(f"Measuring {backend} with batches of {batch_size}...")
+                results.append(
+                    {
+                        "vector_store": backend,
+                        **measure(vector_db, queries, args.limit, batch_size),
+                    }
+                )
+    finally:
+        if not args.keep_corpus:
+            with vector_db.engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "DELETE FROM health.medication_cache "
+                        "WHERE brand_name LIKE :prefix"
+                    ),
+                    {"prefix": f"{BRAND_PREFIX} %"},
+                )
+        context.close()
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
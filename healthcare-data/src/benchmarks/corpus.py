@@ -0,0 +1,62 @@
+import random
+from typing import Dict, List
+
+BRAND_PREFIX = "Bench"
+
+SYMPTOMS = [
+    "migraine",
+    "headache",
+    "seasonal allergies",
+    "runny nose",
+    "nasal congestion",
+    "cough",
+    "sore throat",
+    "fever",
+    "heartburn",
+    "acid indigestion",
+    "muscle aches",
+    "back pain",
+    "joint pain",
+    "insomnia",
+    "drowsiness",
+    "motion sickness",
+    "diarrhea",
+    "constipation",
+    "itching",
+    "minor skin irritation",
+]
+
+SYLLABLES = ["zo", "ra", "vex", "li", "na", "tor", "mi", "quel", "dra", "pax", "ol"]
+SUFFIXES = ["ine", "ol", "amide", "profen", "tadine", "azole", "cillin", "pam"]
+
+
+def _name(rng: random.Random, parts: int) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(parts))
+
+
+def make_medication(rng: random.Random, index: int) -> Dict:
+    """Build one synthetic medication shaped like FDAClient results"""
+    symptoms = rng.sample(SYMPTOMS, rng.randint(1, 3))
+    generic = _name(rng, 2) + rng.choice(SUFFIXES)
+    return {
+        "brand_name": f"{BRAND_PREFIX} {_name(rng, 2).title()} {index}",
+        "generic_name": generic,
+        "indications": "Uses temporarily relieves " + ", ".join(symptoms),
+        "warnings": "Do not use with other products containing " + generic,
+        "dosage": f"Take {rng.randint(1, 2)} tablet every {rng.choice([4, 6, 8])} hours",
+    }
+
+
+def make_corpus(size: int, seed: int = 0) -> List[Dict]:
+    """Build a reproducible synthetic medication corpus"""
+    rng = random.Random(seed)
+    return [make_medication(rng, index) for index in range(size)]
+
+
+def make_queries(count: int, seed: int = 1) -> List[str]:
+    """Build a reproducible query mix dominated by repeated symptoms"""
+    rng = random.Random(seed)
+    return [
+        " and ".join(rng.sample(SYMPTOMS, rng.choice([1, 1, 1, 2])))
+        for _ in range(count)
+    ]
@@ -0,0 +1,145 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.benchmarks.corpus import make_queries
+from src.benchmarks.run import git_revision, peak_rss_mb, percentile
+from src.data.embedding_model import load_model
+from src.data.remote_encoder import RemoteEncoder
+
+SERVER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_server.py"
+)
+
+
+def worker(mode: str, socket_path: str, queries: List[str], barrier) -> Dict:
+    """Embed queries one at a time, as a search worker would"""
+    if mode == "shared":
+        model = RemoteEncoder(socket_path)
+    else:
+        model = load_model(remote=False)
+    model.encode(queries[:4])
+
+    # Start together so the run measures contention, not staggered loading
+    barrier.wait()
+    start = time.time()
+    latencies = []
+    for query in queries:
+        began = time.perf_counter()
+        model.encode(query)
+        latencies.append((time.perf_counter() - began) * 1000)
+    return {
+        "start": start,
+        "end": time.time(),
+        "latencies": latencies,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def wait_for_server(socket_path: str, timeout: float) -> RemoteEncoder:
+    deadline = time.monotonic() + timeout
+    client = RemoteEncoder(socket_path)
+    while True:
+        try:
+            client.info()
+            return client
+        except ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def run(mode: str, workers: int, queries: List[str], socket_path: str) -> Dict:
+    server = None
+    client = None
+    if mode == "shared":
+        server = subprocess.Popen([sys.executable, SERVER, "--socket", socket_path])
+        client = wait_for_server(socket_path, timeout=120)
+
+    try:
+        spawn = multiprocessing.get_context("spawn")
+        manager = spawn.Manager()
+        barrier = manager.Barrier(workers)
+        shares = [queries[i::workers] for i in range(workers)]
+        with spawn.Pool(workers) as pool:
+            results = pool.starmap(
+                worker, [(mode, socket_path, share, barrier) for share in shares]
+            )
+        manager.shutdown()
+        server_rss = client.info()["peak_rss_mb"] if client else 0.0
+    finally:
+        if client:
+            client.close()
+        if server:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(ms for result in results for ms in result["latencies"])
+    wall = max(r["end"] for r in results) - min(r["start"] for r in results)
+    worker_rss = sum(r["peak_rss_mb"] for r in results)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "queries": len(latencies),
+        "queries_per_second": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "worker_rss_mb": round(worker_rss, 1),
+        "server_rss_mb": round(server_rss, 1),
+        "total_rss_mb": round(worker_rss + server_rss, 1),
+    }
+
+
+def main():
+    """Compare per-worker models with one shared embedding server"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument(
+        "--modes", nargs="+", choices=["local", "shared"], default=["local", "shared"]
+    )
+    parser.add_argument("--socket", default="/tmp/healthcare-bench-embedding.sock")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, args.seed)
+    results = []
+    for workers in args.workers:
+        for mode in args.modes:
+            print(f"Measuring {mode} with {workers} workers...")
+            results.append(run(mode, workers, queries, args.socket))
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.benchmarks.corpus import make_corpus, make_queries
+from src.benchmarks.run import git_revision, peak_rss_mb, percentile
+from src.data.embedding_model import encoder_parity, load_model
+from src.data.vector_db import medication_text
+
+ENCODERS = {
+    "torch": {"backend": "torch", "remote": False},
+    "onnx": {"backend": "onnx", "quantized": False, "remote": False},
+    "onnx-int8": {"backend": "onnx", "quantized": True, "remote": False},
+}
+
+
+def measure(name: str, queries: List[str], texts: List[str], params: Dict) -> Dict:
+    """Time one encoder in a fresh process so its memory is measured alone"""
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    model = load_model(threads=params["threads"], **ENCODERS[name])
+    load_seconds = time.perf_counter() - start
+
+    # Warm-up so one-off allocations are not counted as query latency
+    model.encode(queries[:8])
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.encode(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    start = time.perf_counter()
+    model.encode(texts, batch_size=params["batch_size"])
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "encoder": name,
+        "load_seconds": round(load_seconds, 3),
+        "query_p50_ms": round(percentile(latencies, 0.50), 3),
+        "query_p95_ms": round(percentile(latencies, 0.95), 3),
+        "query_p99_ms": round(percentile(latencies, 0.99), 3),
+        "batch_texts_per_second": round(len(texts) / batch_seconds, 1),
+        "model_rss_mb": round(peak_rss_mb() - baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def parity(encoders: List[str], texts: List[str], threads: int) -> Dict:
+    reference = load_model("torch", threads=threads, remote=False)
+    return {
+        name: encoder_parity(
+            reference, load_model(threads=threads, **ENCODERS[name]), texts
+        )
+        for name in encoders
+        if name != "torch"
+    }
+
+
+def main():
+    """Compare embedding encoders: latency, throughput, memory and parity"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--encoders", nargs="+", choices=list(ENCODERS), default=list(ENCODERS)
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--threads", type=int, default=int(os.getenv("EMBEDDING_THREADS", "0"))
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, args.seed + 1)
+    texts = [medication_text(med) for med in make_corpus(args.texts, args.seed)]
+    params = {"threads": args.threads or None, "batch_size": args.batch_size}
+
+    # Spawned workers start clean, so each peak RSS covers one encoder only
+    spawn = multiprocessing.get_context("spawn")
+    results = []
+    for name in args.encoders:
+        print(f"Measuring {name}...")
+        with spawn.Pool(1) as pool:
+            results.append(pool.apply(measure, (name, queries, texts, params)))
+
+    reference = next((r for r in results if r["encoder"] == "torch"), None)
+    if reference:
+        for result in results:
+            result["query_speedup"] = round(
+                reference["query_p50_ms"] / result["query_p50_ms"], 2
+            )
+            result["batch_speedup"] = round(
+                result["batch_texts_per_second"] / reference["batch_texts_per_second"],
+                2,
+            )
+            result["memory_saved_mb"] = round(
+                reference["model_rss_mb"] - result["model_rss_mb"], 1
+            )
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": vars(args),
+        },
+        "results": results,
+        "parity": parity(args.encoders, texts[:500] + queries, params["threads"]),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
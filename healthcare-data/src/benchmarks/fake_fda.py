@@ -0,0 +1,103 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .corpus import make_medication
+
+
+class FakeFDAServer:
+    """Local stand-in for api.fda.gov with injectable latency and errors
+
+    Serves /drug/label.json with synthetic labels derived from the search
+    string. Each request sleeps latency_ms plus up to jitter_ms, then fails
+    with a 500 at error_rate or a 429 at throttle_rate.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 100,
+        jitter_ms: float = 50,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/drug"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake.lock:
+                    fake.requests += 1
+                    delay = fake.latency_ms + fake.rng.random() * fake.jitter_ms
+                    roll = fake.rng.random()
+                time.sleep(delay / 1000)
+
+                url = urlparse(self.path)
+                if url.path != "/drug/label.json":
+                    return self._send(404, {"error": {"code": "NOT_FOUND"}})
+                if roll < fake.error_rate:
+                    return self._send(500, {"error": {"code": "SERVER_ERROR"}})
+                if roll < fake.error_rate + fake.throttle_rate:
+                    return self._send(429, {"error": {"code": "TOO_MANY_REQUESTS"}})
+
+                params = parse_qs(url.query)
+                search = params.get("search", [""])[0]
+                limit = int(params.get("limit", ["5"])[0])
+                rng = random.Random(search)
+                results = []
+                for index in range(limit):
+                    med = make_medication(rng, index)
+                    results.append(
+                        {
+                            "openfda": {
+                                "brand_name": [med["brand_name"]],
+                                "generic_name": [med["generic_name"]],
+                            },
+                            "indications_and_usage": [med["indications"]],
+                            "warnings": [med["warnings"]],
+                            "dosage_and_administration": [med["dosage"]],
+                            "drug_interactions": [
+                                f"Avoid combining with {med['generic_name']}"
+                            ],
+                        }
+                    )
+                self._send(200, {"results": results})
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeFDAServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
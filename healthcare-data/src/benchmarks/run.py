@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy import text
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.benchmarks.corpus import BRAND_PREFIX, make_corpus, make_queries
+from src.benchmarks.fake_fda import FakeFDAServer
+from src.data.embedding_batcher import EmbeddingBatcher
+
+WORKLOADS = ["search", "ingest", "process_query", "fda", "embed", "embed_batched"]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> Dict:
+    latencies = sorted(latencies)
+    return {
+        "operations": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(len(latencies) / wall_seconds, 2)
+        if wall_seconds
+        else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_threaded(fn: Callable, items: List, concurrency: int) -> Dict:
+    """Call fn on every item from a thread pool, timing each call"""
+    latencies = []
+    errors = 0
+
+    def timed(item):
+        start = time.perf_counter()
+        try:
+            fn(item)
+            return (time.perf_counter() - start) * 1000, False
+        except Exception:
+            return (time.perf_counter() - start) * 1000, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, failed in pool.map(timed, items):
+            latencies.append(latency)
+            errors += failed
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_async(fn: Callable, items: List, concurrency: int) -> Dict:
+    """Await fn on every item with at most concurrency in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def timed(item):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await fn(item)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(item) for item in items))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def delete_history(engine, since: datetime, queries: List[str]):
+    """Remove the query_history and search_results rows a run recorded"""
+    params = {"since": since, "queries": sorted(set(queries))}
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                DELETE FROM health.search_results
+                WHERE created_at >= :since
+                  AND query_id IN (
+                    SELECT id FROM health.query_history
+                    WHERE created_at >= :since AND query_text = ANY(:queries)
+                  )
+            """),
+            params,
+        )
+        conn.execute(
+            text(
+                "DELETE FROM health.query_history "
+                "WHERE created_at >= :since AND query_text = ANY(:queries)"
+            ),
+            params,
+        )
+
+
+async def run_benchmarks(args) -> Dict:
+    from src.context import AppContext
+    from src.main import process_query
+
+    server = FakeFDAServer(
+        latency_ms=args.fda_latency_ms,
+        jitter_ms=args.fda_jitter_ms,
+        error_rate=args.fda_error_rate,
+        throttle_rate=args.fda_throttle_rate,
+        seed=args.seed,
+    ).start()
+    os.environ["FDA_BASE_URL"] = server.base_url
+    os.environ.setdefault("FDA_API_KEY", "benchmark")
+    if not args.fda_cache:
+        os.environ["FDA_CACHE_PATH"] = ""
+    if args.vector_store:
+        os.environ["VECTOR_STORE"] = args.vector_store
+    # Start from empty caches so runs do not depend on earlier ones
+    embedding_cache_dir = tempfile.mkdtemp(prefix="benchmark-embeddings-")
+    os.environ["EMBEDDING_CACHE_DIR"] = embedding_cache_dir
+    os.environ["SEMANTIC_CACHE_MAX_DISTANCE"] = "0"
+
+    corpus = make_corpus(args.corpus_size, args.seed)
+    queries = make_queries(args.queries, args.seed + 1)
+    results = []
+
+    started_at = datetime.now()
+    start = time.perf_counter()
+    context = AppContext()
+    startup_seconds = time.perf_counter() - start
+
+    async def full_query(query: str):
+        await process_query(query, context)
+
+    async def fda_search(query: str):
+        await context.async_fda_client.search_medications([query])
+
+    batcher = EmbeddingBatcher(
+        context.vector_db.generate_embeddings,
+        max_batch_size=args.embed_batch_size,
+        max_wait_ms=args.embed_batch_wait_ms,
+    )
+
+    run_id = uuid.uuid4().hex[:8]
+
+    def uncached(workload: str, concurrency: int) -> List[str]:
+        # Unique texts so neither embedding cache tier can answer for the model
+        return [
+            f"{q} #{run_id}-{workload}-{concurrency}-{i}" for i, q in enumerate(queries)
+        ]
+
+    # Benchmark output would drown in the per-query printing
+    with open(os.devnull, "w") as devnull:
+        try:
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                counts = context.vector_db.cache_medications(corpus)
+                seconds = time.perf_counter() - start
+            results.append(
+                {
+                    "workload": "ingest_bulk",
+                    "concurrency": 1,
+                    "labels": len(corpus),
+                    "wall_seconds": round(seconds, 3),
+                    "labels_per_second": round(len(corpus) / seconds, 1)
+                    if seconds
+                    else 0.0,
+                    **counts,
+                    "peak_rss_mb": round(peak_rss_mb(), 1),
+                }
+            )
+
+            for workload in args.workloads:
+                for concurrency in args.concurrency:
+                    print(f"Running {workload} at concurrency {concurrency}...")
+                    with contextlib.redirect_stdout(devnull):
+                        if workload == "search":
+                            summary = run_threaded(
+                                context.vector_db.find_similar_medications,
+                                queries,
+                                concurrency,
+                            )
+                        elif workload == "ingest":
+                            summary = run_threaded(
+                                context.vector_db.cache_medication,
+                                corpus[: args.queries],
+                                concurrency,
+                            )
+                        elif workload == "process_query":
+                            summary = await run_async(full_query, queries, concurrency)
+                        elif workload == "embed":
+                            summary = run_threaded(
+                                context.vector_db.generate_embedding,
+                                uncached(workload, concurrency),
+                                concurrency,
+                            )
+                        elif workload == "embed_batched":
+                            summary = await run_async(
+                                batcher.embed,
+                                uncached(workload, concurrency),
+                                concurrency,
+                            )
+                        else:
+                            summary = await run_async(fda_search, queries, concurrency)
+                    results.append(
+                        {"workload": workload, "concurrency": concurrency, **summary}
+                    )
+        finally:
+            if not args.keep_corpus:
+                with context.vector_db.engine.begin() as conn:
+                    conn.execute(
+                        text(
+                            "DELETE FROM health.medication_cache "
+                            "WHERE brand_name LIKE :prefix"
+                        ),
+                        {"prefix": f"{BRAND_PREFIX} %"},
+                    )
+            cache_stats = {
+                **context.vector_db.cache_stats(),
+                "fda": context.async_fda_client.cache_stats(),
+            }
+            await batcher.close()
+            await context.aclose()
+            # After aclose so the analytics writer has flushed; a disposed
+            # engine opens a fresh pool
+            delete_history(context.vector_db.engine, started_at, queries)
+            context.vector_db.engine.dispose()
+            shutil.rmtree(embedding_cache_dir, ignore_errors=True)
+            server.stop()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "startup_seconds": round(startup_seconds, 3),
+            "fda_upstream_requests": server.requests,
+            "cache_stats": cache_stats,
+            "params": vars(args),
+        },
+        "results": results,
+    }
+
+
+def main():
+    """Benchmark search, ingest and FDA fallback paths against a stand-in OpenFDA"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--corpus-size", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=WORKLOADS)
+    parser.add_argument("--vector-store", choices=["pgvector", "numpy", "hnsw"])
+    parser.add_argument("--embed-batch-size", type=int, default=32)
+    parser.add_argument("--embed-batch-wait-ms", type=float, default=5)
+    parser.add_argument("--fda-latency-ms", type=float, default=100)
+    parser.add_argument("--fda-jitter-ms", type=float, default=50)
+    parser.add_argument("--fda-error-rate", type=float, default=0.0)
+    parser.add_argument("--fda-throttle-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--fda-cache", action="store_true", help="keep the OpenFDA response cache on"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--keep-corpus", action="store_true", help="leave synthetic rows in the DB"
+    )
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmarks(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Awaitable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from src.data.async_fda_client import AsyncFDAClient
+from src.data.fda_client import FDAClient
+from src.data.response_cache import ResponseCache
+from src.data.vector_db import HealthcareVectorDB
+from src.utils.logger import setup_logger
+from src.utils.metrics import (
+    collect_stages,
+    start_metrics_server,
+    stop_metrics_server,
+    timed,
+    write_metrics,
+)
+
+
+class AppContext:
+    """Process-wide resources shared by every entry point
+
+    Owns the single embedding model, database engine (and its connection
+    pool) and FDA client so a query never pays their start-up cost.
+    """
+
+    def __init__(self):
+        load_dotenv()
+        setup_logger("src", getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper()))
+        if os.getenv("TRACE_REQUESTS", "false").lower() == "true":
+            setup_logger("trace")
+
+        # Metrics are served over HTTP and/or written to a file on close
+        port = os.getenv("METRICS_PORT")
+        self.metrics_server = start_metrics_server(int(port)) if port else None
+        self.metrics_file = os.getenv("METRICS_FILE")
+
+        # Both FDA clients share one on-disk response cache
+        with timed("startup_fda_cache"):
+            self.fda_cache = ResponseCache.from_env()
+        self.fda_client = FDAClient(cache=self.fda_cache)
+        self.async_fda_client = AsyncFDAClient(cache=self.fda_cache)
+        self.vector_db = HealthcareVectorDB(fda_client=self.fda_client)
+
+        # Work started off the request path, awaited before closing
+        self.background: Set[asyncio.Task] = set()
+
+    def spawn(self, work: Awaitable) -> asyncio.Task:
+        """Run work in the background, keeping it alive until aclose"""
+        task = asyncio.ensure_future(work)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+        return task
+
+    def close(self):
+        """Flush caches and release pooled database connections"""
+        self.vector_db.close()
+        if self.fda_cache is not None:
+            self.fda_cache.close()
+        if self.metrics_file:
+            write_metrics(self.metrics_file)
+        stop_metrics_server(self.metrics_server)
+
+    async def aclose(self):
+        """Finish background work, close pooled HTTP connections, then the rest"""
+        if self.background:
+            await asyncio.gather(*self.background, return_exceptions=True)
+        await self.async_fda_client.close()
+        self.close()
+
+
+_context: Optional[AppContext] = None
+_context_lock = threading.Lock()
+
+
+def get_app_context() -> AppContext:
+    """Return the process-wide context, creating it on first use"""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = AppContext()
+    return _context
+
+
+def close_app_context():
+    """Dispose of the process-wide context if it was created"""
+    global _context
+    with _context_lock:
+        if _context is not None:
+            _context.close()
+            _context = None
+
+
+def profile_startup() -> List[Tuple[str, float]]:
+    """Create the process-wide context and load the model, timing each phase"""
+    with collect_stages() as stages:
+        get_app_context().vector_db.warm_up()
+    return stages
+
+
+async def aclose_app_context():
+    """Dispose of the process-wide context from inside an event loop"""
+    global _context
+    with _context_lock:
+        context, _context = _context, None
+    if context is not None:
+        await context.aclose()
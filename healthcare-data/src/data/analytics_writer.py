@@ -0,0 +1,162 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from ..utils.metrics import count, timed
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AnalyticsWriter:
+    """Write-behind queue for QueryHistory and SearchResult rows
+
+    Searches enqueue their analytics and return immediately. A background
+    thread drains the bounded queue and writes multi-row INSERTs whenever
+    batch_size records are waiting or flush_interval seconds have passed.
+    When the queue is full, the "drop" policy discards the new record and
+    counts it, while "block" makes the caller wait up to block_timeout
+    seconds before dropping.
+    """
+
+    def __init__(
+        self,
+        engine,
+        query_table,
+        result_table,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = "drop",
+        block_timeout: float = 1.0,
+    ):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.engine = engine
+        self.query_table = query_table
+        self.result_table = result_table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.closed = False
+
+        self.thread = threading.Thread(
+            target=self._run, name="analytics-writer", daemon=True
+        )
+        self.thread.start()
+
+    def record(
+        self,
+        query_text: str,
+        embedding: Optional[List[float]],
+        results: List[Tuple[object, float]],
+    ) -> uuid.UUID:
+        """Queue a query and its ranked (medication_id, similarity) results"""
+        query_id = uuid.uuid4()
+        if self.closed:
+            self.dropped += 1
+            return query_id
+
+        record = (query_id, query_text, embedding, results, datetime.now())
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            count("analytics_records_total", outcome="dropped")
+        return query_id
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(batch)
+                return
+            if item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch: List):
+        if not batch:
+            return
+
+        queries = []
+        results = []
+        for query_id, query_text, embedding, hits, created_at in batch:
+            queries.append(
+                {
+                    "id": query_id,
+                    "query_text": query_text,
+                    "embedding": embedding,
+                    "results_count": len(hits),
+                    "created_at": created_at,
+                }
+            )
+            for rank, (medication_id, similarity) in enumerate(hits, 1):
+                results.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "query_id": query_id,
+                        "medication_id": medication_id,
+                        "similarity_score": similarity,
+                        "rank": rank,
+                        "created_at": created_at,
+                    }
+                )
+
+        try:
+            # executemany on an INSERT is sent as batched multi-row VALUES
+            with timed("analytics_write"), self.engine.begin() as conn:
+                conn.execute(insert(self.query_table), queries)
+                if results:
+                    conn.execute(insert(self.result_table), results)
+            self.written += len(batch)
+            count("analytics_records_total", len(batch), outcome="written")
+        except Exception as e:
+            self.failed += len(batch)
+            count("analytics_records_total", len(batch), outcome="failed")
+            logger.error("Error writing search analytics: %s", e)
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting records and flush everything already queued"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Return queue depth and written/dropped/failed counters"""
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -0,0 +1,179 @@
+import math
+import re
+from typing import Dict, Optional
+
+from sqlalchemy.sql import text
+
+from .embedding_model import EMBEDDING_DIM
+
+INDEX_NAME = "idx_medication_cache_embedding"
+TABLE = "health.medication_cache"
+
+# How the index stores embeddings: (indexed expression, operator class,
+# distance operator, query expression). Compact forms index a cast of the
+# full-precision column, which search re-ranks against.
+STORAGE = {
+    "vector": ("embedding", "vector_cosine_ops", "<=>", "$1"),
+    "halfvec": (
+        f"(embedding::halfvec({EMBEDDING_DIM}))",
+        "halfvec_cosine_ops",
+        "<=>",
+        f"$1::halfvec({EMBEDDING_DIM})",
+    ),
+    "bit": (
+        f"(binary_quantize(embedding)::bit({EMBEDDING_DIM}))",
+        "bit_hamming_ops",
+        "<~>",
+        f"binary_quantize($1)::bit({EMBEDDING_DIM})",
+    ),
+}
+
+# (recall target, multiplier) pairs: ivfflat probes scale with sqrt(lists)
+# and HNSW ef_search with a base of 40, following pgvector's tuning notes
+RECALL_MULTIPLIERS = [(0.8, 0.5), (0.9, 1.0), (0.95, 2.0), (0.98, 4.0), (1.0, 8.0)]
+
+
+def plan_index(
+    rows: int,
+    index_type: str = "ivfflat",
+    min_rows: int = 1000,
+    storage: str = "vector",
+) -> Optional[Dict]:
+    """Choose index parameters for a table of the given size
+
+    Returns None when the table is too small for an ANN index to beat an
+    exact scan, which also avoids training ivfflat centroids on no data.
+    """
+    if storage not in STORAGE:
+        raise ValueError(f"Unknown index storage: {storage}")
+    if rows < min_rows:
+        return None
+    if index_type == "hnsw":
+        large = rows > 1_000_000
+        return {
+            "type": "hnsw",
+            "storage": storage,
+            "m": 24 if large else 16,
+            "ef_construction": 128 if large else 64,
+        }
+    if index_type != "ivfflat":
+        raise ValueError(f"Unknown index type: {index_type}")
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+    lists = rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows))
+    return {"type": "ivfflat", "storage": storage, "lists": max(lists, 10)}
+
+
+def index_sql(plan: Dict, name: str = INDEX_NAME, concurrently: bool = True) -> str:
+    """Build the CREATE INDEX statement for a plan"""
+    if plan["type"] == "hnsw":
+        options = f"m = {plan['m']}, ef_construction = {plan['ef_construction']}"
+    else:
+        options = f"lists = {plan['lists']}"
+    expression, opclass, _, _ = STORAGE[plan.get("storage", "vector")]
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} ON {TABLE} "
+        f"USING {plan['type']} ({expression} {opclass}) WITH ({options})"
+    )
+
+
+def current_index(conn) -> Optional[Dict]:
+    """Describe the existing embedding index, or None if there is none"""
+    indexdef = conn.execute(
+        text(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = 'health' AND indexname = :name"
+        ),
+        {"name": INDEX_NAME},
+    ).scalar()
+    if not indexdef:
+        return None
+
+    method = re.search(r"USING (\w+)", indexdef)
+    # None when the index uses an operator class search cannot use
+    storage = next(
+        (name for name, (_, opclass, _, _) in STORAGE.items() if opclass in indexdef),
+        None,
+    )
+    index = {"type": method.group(1) if method else None, "storage": storage}
+    for key, value in re.findall(r"(\w+)\s*=\s*'?(\d+)'?", indexdef):
+        index[key] = int(value)
+    return index
+
+
+def needs_rebuild(current: Optional[Dict], plan: Dict) -> bool:
+    """Whether the existing index is far enough from the plan to rebuild"""
+    if (
+        current is None
+        or current["type"] != plan["type"]
+        or current["storage"] != plan["storage"]
+    ):
+        return True
+    if plan["type"] == "ivfflat":
+        # Rebuild once the table has grown or shrunk by more than 2x
+        lists = current.get("lists", 100)
+        return not plan["lists"] / 2 <= lists <= plan["lists"] * 2
+    return current.get("m") != plan["m"]
+
+
+def column_type(conn, table: str, column: str = "embedding") -> Optional[str]:
+    """Return the SQL type of a column, e.g. vector(384) or halfvec(384)"""
+    return conn.execute(
+        text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = CAST(:table AS regclass) AND attname = :column "
+            "AND NOT attisdropped"
+        ),
+        {"table": table, "column": column},
+    ).scalar()
+
+
+def session_settings(index: Optional[Dict], recall_target: float) -> Dict[str, int]:
+    """Per-session search settings for the index at a target recall"""
+    if index is None:
+        return {}
+    multiplier = next(
+        (m for recall, m in RECALL_MULTIPLIERS if recall_target <= recall),
+        RECALL_MULTIPLIERS[-1][1],
+    )
+    if index["type"] == "hnsw":
+        return {"hnsw.ef_search": int(40 * multiplier)}
+    if index["type"] == "ivfflat":
+        lists = index.get("lists", 100)
+        probes = math.ceil(math.sqrt(lists) * multiplier)
+        return {"ivfflat.probes": max(1, min(lists, probes))}
+    return {}
+
+
+def ensure_index(
+    engine,
+    index_type: str = "ivfflat",
+    min_rows: int = 1000,
+    force: bool = False,
+    storage: str = "vector",
+) -> Dict:
+    """Create or rebuild the embedding index to suit the current row count
+
+    Rebuilds build the replacement with CREATE INDEX CONCURRENTLY and swap
+    it in by rename, so searches keep using the old index meanwhile.
+    Changing storage (vector, halfvec or bit) also triggers a rebuild.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        rows = conn.execute(text(f"SELECT COUNT(*) FROM {TABLE}")).scalar()
+        plan = plan_index(rows, index_type, min_rows, storage)
+        current = current_index(conn)
+        report = {"rows": rows, "current": current, "planned": plan, "action": "none"}
+
+        if plan is None or (not force and not needs_rebuild(current, plan)):
+            return report
+
+        new_name = f"{INDEX_NAME}_new"
+        # A failed concurrent build leaves an invalid index behind
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS health.{new_name}"))
+        conn.execute(text(index_sql(plan, new_name)))
+        if current is not None:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY health.{INDEX_NAME}"))
+        conn.execute(text(f"ALTER INDEX health.{new_name} RENAME TO {INDEX_NAME}"))
+        conn.execute(text(f"ANALYZE {TABLE}"))
+
+        report["action"] = "rebuilt" if current is not None else "created"
+        return report
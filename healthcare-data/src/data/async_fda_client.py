@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from .fda_client import (
+    FDA_BASE_URL,
+    format_interactions,
+    format_medication,
+    interaction_search_params,
+    symptom_search_params,
+)
+from ..utils.metrics import count, timed
+from .response_cache import AsyncSingleFlight, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket limiting requests to a per-minute quota"""
+
+    def __init__(self, per_minute: float, burst: Optional[int] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, int(self.rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncFDAClient:
+    """Non-blocking OpenFDA client with pooling, rate limiting and retries
+
+    All requests share one aiohttp connection pool. A semaphore bounds the
+    number of in-flight requests, a token bucket keeps us within openFDA's
+    per-minute quota, and 429/5xx responses are retried with exponential
+    backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        load_dotenv()
+        self.api_key = os.getenv("FDA_API_KEY")
+        self.base_url = os.getenv("FDA_BASE_URL", FDA_BASE_URL)
+
+        if not self.api_key:
+            raise ValueError("FDA_API_KEY not found in environment variables")
+
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("FDA_MAX_CONCURRENCY", "8")
+        )
+        # openFDA allows 240 requests per minute per API key
+        self.requests_per_minute = requests_per_minute or float(
+            os.getenv("FDA_RATE_LIMIT_PER_MINUTE", "240")
+        )
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("FDA_MAX_RETRIES", "3"))
+        )
+        self.timeout = timeout or float(os.getenv("FDA_TIMEOUT", "10"))
+        self.backoff_base = 0.5
+        self.backoff_max = 8.0
+
+        # Created lazily so they bind to the running event loop
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.bucket: Optional[TokenBucket] = None
+
+        # Response cache with single-flight coalescing of identical requests
+        self.cache = cache or ResponseCache.from_env()
+        self.single_flight = AsyncSingleFlight()
+        self.upstream_calls = 0
+        self.refresh_tasks = set()
+
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_concurrency, keepalive_timeout=30
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.bucket = TokenBucket(self.requests_per_minute)
+        return self.session
+
+    async def close(self):
+        """Cancel background refreshes and close the pooled connections"""
+        for task in list(self.refresh_tasks):
+            task.cancel()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def _get_results(self, endpoint: str, params: Dict) -> List[Dict]:
+        """Return label.json results, serving from cache where possible"""
+        key = ResponseCache.make_key(endpoint, params)
+
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                results, stale = cached
+                if stale:
+                    # Serve the stale copy and revalidate in the background
+                    task = asyncio.ensure_future(self._revalidate(endpoint, key, params))
+                    self.refresh_tasks.add(task)
+                    task.add_done_callback(self.refresh_tasks.discard)
+                return results
+
+        return await self.single_flight.do(
+            key, lambda: self._fetch_upstream(endpoint, key, params)
+        )
+
+    async def _revalidate(self, endpoint: str, key: str, params: Dict):
+        try:
+            await self.single_flight.do(
+                key, lambda: self._fetch_upstream(endpoint, key, params)
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Error refreshing OpenFDA response: %s", e)
+
+    async def _fetch_upstream(self, endpoint: str, key: str, params: Dict) -> List[Dict]:
+        """Call label.json and store the results in the response cache"""
+        with timed("fda_call"):
+            results = await self._request(params)
+        if self.cache is not None:
+            self.cache.set(key, endpoint, results)
+        return results
+
+    def cache_stats(self) -> Dict:
+        """Return response cache and upstream call counters"""
+        stats = self.cache.stats() if self.cache is not None else {}
+        stats["upstream_calls"] = self.upstream_calls
+        stats["coalesced"] = self.single_flight.coalesced
+        return stats
+
+    async def _request(self, params: Dict) -> List[Dict]:
+        """GET label.json with rate limiting and retries, returning results"""
+        session = await self._ensure_session()
+        url = f"{self.base_url}/label.json"
+
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.upstream_calls += 1
+            retry_after = None
+            try:
+                async with self.semaphore:
+                    async with session.get(url, params=params) as response:
+                        count("fda_responses_total", status=response.status)
+                        # openFDA answers 404 when nothing matches
+                        if response.status == 404:
+                            return []
+                        if response.status not in RETRY_STATUSES:
+                            response.raise_for_status()
+                            data = await response.json()
+                            return data.get("results", [])
+                        retry_after = response.headers.get("Retry-After")
+                        error = aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                            message=response.reason or "",
+                        )
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                count("fda_responses_total", status="error")
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    async def search_medications(
+        self, symptoms: List[str], limit: int = 5
+    ) -> List[Dict]:
+        """Search medications based on symptoms"""
+        try:
+            params = symptom_search_params(self.api_key, symptoms, limit)
+            results = await self._get_results("search", params)
+            return [format_medication(result) for result in results]
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Error querying OpenFDA API: %s", e)
+            return []
+
+    async def get_drug_interactions(self, drug_name: str) -> List[str]:
+        """Get drug interactions for a specific medication"""
+        try:
+            params = interaction_search_params(self.api_key, drug_name)
+            return format_interactions(await self._get_results("interactions", params))
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Error querying OpenFDA API: %s", e)
+            return ["Error retrieving interaction information"]
+
+    async def get_label(self, drug_name: str, fresh: bool = False) -> Optional[Dict]:
+        """Return the raw label for a brand or generic name, or None
+
+        fresh skips the response cache (the result still updates it), for
+        refreshing medications whose cached copy has aged out.
+        """
+        params = interaction_search_params(self.api_key, drug_name)
+        try:
+            if fresh:
+                key = ResponseCache.make_key("interactions", params)
+                results = await self._fetch_upstream("interactions", key, params)
+            else:
+                results = await self._get_results("interactions", params)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Error querying OpenFDA API: %s", e)
+            return None
+        return results[0] if results else None
+
+    async def search_medications_many(
+        self, symptom_lists: List[List[str]], limit: int = 5
+    ) -> List[List[Dict]]:
+        """Run several symptom searches concurrently, in input order"""
+        return await asyncio.gather(
+            *(self.search_medications(symptoms, limit) for symptoms in symptom_lists)
+        )
+
+    async def get_drug_interactions_many(
+        self, drug_names: List[str]
+    ) -> Dict[str, List[str]]:
+        """Look up interactions for several drugs concurrently"""
+        results = await asyncio.gather(
+            *(self.get_drug_interactions(name) for name in drug_names)
+        )
+        return dict(zip(drug_names, results))
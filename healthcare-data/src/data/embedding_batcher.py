@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from ..utils.metrics import count
+
+
+class EmbeddingBatcher:
+    """Group concurrent embedding requests into one encode call
+
+    Callers await embed() for a single text. A background task takes the
+    first waiting request, gathers whatever else arrives within max_wait_ms
+    (up to max_batch_size texts), and hands the batch to encode on a single
+    worker thread so the event loop keeps accepting requests. While a batch
+    is encoding, new requests queue up and form the next batch, so batches
+    grow with load and a lone request only waits max_wait_ms.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # One worker: the model already parallelizes a batch across cores
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self):
+        if self.task is None:
+            self.queue = asyncio.Queue()
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding for text, encoded alongside other requests"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((text, future))
+        return await future
+
+    async def _collect(self) -> List:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take everything already waiting before sleeping for more
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Identical texts in one batch are only encoded once
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            count("embedding_batches_total")
+            count("embedding_batch_texts_total", len(texts))
+            try:
+                embeddings = await loop.run_in_executor(
+                    self.executor, self.encode, texts
+                )
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            by_text = dict(zip(texts, embeddings))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
+    async def close(self):
+        """Stop batching and fail any requests still waiting"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+            while not self.queue.empty():
+                _, future = self.queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,245 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+from ..utils.metrics import cache_event
+
+KEY_BYTES = 20  # sha1 digest size
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry
+
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so lowercasing and
+    collapsing whitespace does not change the resulting embedding.
+    """
+    return " ".join(text.lower().split())
+
+
+def text_key(text: str) -> bytes:
+    """Hash normalized text into a fixed-size cache key"""
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).digest()
+
+
+class DiskEmbeddingStore:
+    """Fixed-capacity on-disk embedding store backed by memory-mapped files
+
+    Vectors live in a float32 matrix and their keys in a parallel byte
+    matrix, so the lookup index can be rebuilt from disk on start-up.
+    Slots are reused in round-robin order once the store is full.
+
+    Several processes may share a directory. Slots are claimed from a
+    shared write counter under an exclusive lock file, and before each
+    lookup a process indexes the slots others have written since it last
+    looked.
+    """
+
+    def __init__(self, directory: str, dim: int, capacity: int):
+        self.directory = directory
+        self.dim = dim
+        self.capacity = capacity
+        os.makedirs(directory, exist_ok=True)
+
+        self.meta_path = os.path.join(directory, "meta.json")
+        vectors_path = os.path.join(directory, "vectors.f32")
+        keys_path = os.path.join(directory, "keys.bin")
+        counter_path = os.path.join(directory, "writes.bin")
+        self.lock_file = open(os.path.join(directory, "lock"), "a+")
+
+        with self._locked(fcntl.LOCK_EX):
+            meta = self._read_meta()
+            fresh = (
+                meta.get("dim") != dim
+                or meta.get("capacity") != capacity
+                or not os.path.exists(vectors_path)
+                or not os.path.exists(keys_path)
+                or not os.path.exists(counter_path)
+            )
+            mode = "w+" if fresh else "r+"
+            self.vectors = np.memmap(
+                vectors_path, dtype=np.float32, mode=mode, shape=(capacity, dim)
+            )
+            self.keys = np.memmap(
+                keys_path, dtype=np.uint8, mode=mode, shape=(capacity, KEY_BYTES)
+            )
+            # Total writes ever made; the next slot is writes % capacity
+            self.writes = np.memmap(counter_path, dtype=np.int64, mode=mode, shape=(1,))
+            if fresh:
+                self._write_meta()
+
+        # key -> slot for the slots this process has seen, and the reverse
+        self.index: Dict[bytes, int] = {}
+        self.owners: Dict[int, bytes] = {}
+        self.synced = 0
+        with self._locked(fcntl.LOCK_SH):
+            self._sync()
+
+    @contextmanager
+    def _locked(self, operation: int):
+        fcntl.flock(self.lock_file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        with open(self.meta_path, "w") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity}, f)
+
+    def _assign(self, key: bytes, slot: int):
+        old_key = self.owners.get(slot)
+        if old_key is not None:
+            self.index.pop(old_key, None)
+        self.index[key] = slot
+        self.owners[slot] = key
+
+    def _sync(self):
+        """Index the slots written, by any process, since the last sync"""
+        writes = int(self.writes[0])
+        for n in range(max(self.synced, writes - self.capacity), writes):
+            slot = n % self.capacity
+            key = self.keys[slot].tobytes()
+            if any(key):
+                self._assign(key, slot)
+        self.synced = writes
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._locked(fcntl.LOCK_SH):
+            self._sync()
+            slot = self.index.get(key)
+            if slot is None:
+                return None
+            return np.array(self.vectors[slot])
+
+    def put(self, key: bytes, vector: np.ndarray):
+        with self._locked(fcntl.LOCK_EX):
+            self._sync()
+            if key in self.index:
+                return
+            writes = int(self.writes[0])
+            slot = writes % self.capacity
+
+            # Evict whatever occupied the slot; clear its key before writing
+            # the vector so a crash never pairs a stale key with a new vector
+            self.keys[slot] = 0
+            self.vectors[slot] = vector
+            self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self.writes[0] = writes + 1
+            self._assign(key, slot)
+            self.synced = writes + 1
+
+    def flush(self):
+        with self._locked(fcntl.LOCK_EX):
+            self.vectors.flush()
+            self.keys.flush()
+            self.writes.flush()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-memory LRU in front of a disk store
+
+    Entries are keyed by a hash of the normalized text and namespaced by
+    model name, so switching models never serves stale vectors.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dim: int,
+        memory_size: int = 10000,
+        cache_dir: Optional[str] = None,
+        disk_size: int = 100000,
+    ):
+        self.model_name = model_name
+        self.dim = dim
+        self.memory_size = memory_size
+        self.memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.disk: Optional[DiskEmbeddingStore] = None
+        if cache_dir and disk_size > 0:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+            self.disk = DiskEmbeddingStore(
+                os.path.join(cache_dir, f"{safe_name}-{dim}"), dim, disk_size
+            )
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for text, or None on a miss"""
+        key = text_key(text)
+        with self.lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                cache_event("embedding", "memory_hit")
+                return vector
+
+            if self.disk is not None:
+                vector = self.disk.get(key)
+                if vector is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    cache_event("embedding", "disk_hit")
+                    return vector
+
+            self.misses += 1
+            cache_event("embedding", "miss")
+            return None
+
+    def put(self, text: str, vector: np.ndarray):
+        """Store an embedding in both tiers"""
+        key = text_key(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            self._remember(key, vector)
+            if self.disk is not None:
+                self.disk.put(key, vector)
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def flush(self):
+        """Persist the disk tier"""
+        with self.lock:
+            if self.disk is not None:
+                self.disk.flush()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and tier sizes"""
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "model": self.model_name,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_entries": len(self.disk) if self.disk is not None else 0,
+            }
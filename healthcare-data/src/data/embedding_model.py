@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from ..utils.metrics import timed
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+DEFAULT_MODEL_PATH = os.path.join("models", MODEL_NAME)
+DEFAULT_ONNX_PATH = os.path.join("models", f"{MODEL_NAME}-onnx")
+
+# Files written by src/scripts/export_onnx.py
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+ONNX_CONFIG_FILE = "encoder.json"
+
+BACKENDS = ["torch", "onnx"]
+
+DEFAULT_SERVER_SOCKET = os.path.join(".cache", "embedding.sock")
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_model_path() -> Optional[str]:
+    """Return the local model directory to load from, if one exists
+
+    EMBEDDING_MODEL_PATH points at a directory written by
+    src/scripts/download_model.py. Loading from it needs no Hub lookup.
+    """
+    path = os.getenv("EMBEDDING_MODEL_PATH", DEFAULT_MODEL_PATH)
+    if path and os.path.isdir(path):
+        return path
+    return None
+
+
+class OnnxEncoder:
+    """all-MiniLM-L6-v2 running as an exported ONNX graph on ONNX Runtime
+
+    Reproduces the SentenceTransformer pipeline (tokenize, transformer,
+    mean pooling over the attention mask, L2 normalization) without
+    importing torch. encode() accepts the same arguments callers pass to
+    SentenceTransformer.encode and returns float32 arrays of the same shape.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        quantized: bool = False,
+        threads: Optional[int] = None,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(directory, ONNX_CONFIG_FILE)) as f:
+            config = json.load(f)
+        self.dim = config["dim"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_seq_length"])
+        self.tokenizer.enable_padding(
+            pad_id=config["pad_token_id"], pad_token=config["pad_token"]
+        )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(directory, model_file),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def encode(
+        self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        # Batch similar lengths together to keep padding small
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            positions = order[start : start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in positions])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+            }
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array(
+                    [e.type_ids for e in encodings], dtype=np.int64
+                )
+            hidden = self.session.run(None, feeds)[0]
+
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(
+                weights.sum(axis=1), 1e-9, None
+            )
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            embeddings[positions] = pooled / np.clip(norms, 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+
+def model_id() -> str:
+    """Name of the configured encoder, used to namespace cached embeddings
+
+    ONNX and int8 vectors differ slightly from the reference model's, so
+    each backend keeps its own cache entries.
+    """
+    if os.getenv("EMBEDDING_BACKEND", "torch") != "onnx":
+        return MODEL_NAME
+    if os.getenv("EMBEDDING_ONNX_QUANTIZED", "false").lower() == "true":
+        return f"{MODEL_NAME}-onnx-int8"
+    return f"{MODEL_NAME}-onnx"
+
+
+def _env_threads() -> Optional[int]:
+    threads = os.getenv("EMBEDDING_THREADS")
+    return int(threads) if threads else None
+
+
+def load_model(
+    backend: Optional[str] = None,
+    threads: Optional[int] = None,
+    quantized: Optional[bool] = None,
+    remote: Optional[bool] = None,
+):
+    """Load the embedding model for the configured backend
+
+    EMBEDDING_BACKEND picks "torch" (sentence-transformers) or "onnx"
+    (an export from src/scripts/export_onnx.py, int8-quantized when
+    EMBEDDING_ONNX_QUANTIZED is true). EMBEDDING_THREADS caps the intra-op
+    threads of either. Heavy libraries are imported here rather than at
+    module level so importing the data layer stays cheap.
+
+    When EMBEDDING_SERVER_SOCKET is set (or remote is true) this returns a
+    client of the shared embedding server instead, and loads nothing.
+    """
+    if remote is None:
+        remote = bool(os.getenv("EMBEDDING_SERVER_SOCKET"))
+    if remote:
+        from .remote_encoder import RemoteEncoder
+
+        return RemoteEncoder(
+            os.getenv("EMBEDDING_SERVER_SOCKET") or DEFAULT_SERVER_SOCKET,
+            timeout=float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "30")),
+            expected_model_id=model_id(),
+        )
+
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    threads = threads or _env_threads()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if backend == "onnx":
+        if quantized is None:
+            quantized = os.getenv("EMBEDDING_ONNX_QUANTIZED", "false").lower() == "true"
+        path = os.getenv("EMBEDDING_ONNX_PATH", DEFAULT_ONNX_PATH)
+        if not os.path.isfile(os.path.join(path, ONNX_CONFIG_FILE)):
+            raise FileNotFoundError(
+                f"No ONNX export at {path}; run src/scripts/export_onnx.py"
+            )
+        with timed("model_load"):
+            return OnnxEncoder(path, quantized=quantized, threads=threads)
+
+    path = resolve_model_path()
+    if path is not None:
+        # Keep transformers from checking the Hub for newer revisions
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    else:
+        logger.warning(
+            "No local model at EMBEDDING_MODEL_PATH, loading %s from the Hub",
+            MODEL_NAME,
+        )
+
+    with timed("model_import"):
+        import torch
+        from sentence_transformers import SentenceTransformer
+    if threads:
+        torch.set_num_threads(threads)
+    with timed("model_load"):
+        return SentenceTransformer(path or MODEL_NAME)
+
+
+def encoder_parity(reference, candidate, texts: List[str], k: int = 5) -> Dict:
+    """Compare a candidate encoder's embeddings with the reference model's
+
+    Reports the cosine similarity between each text's two embeddings and
+    how often the top-k nearest texts (by each model) agree.
+    """
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    cosine = (expected * actual).sum(axis=1)
+
+    k = min(k, len(texts) - 1)
+    overlap = 0.0
+    if k > 0:
+        # Rank every text's neighbours under both models, excluding itself
+        expected_sims = expected @ expected.T
+        actual_sims = actual @ actual.T
+        np.fill_diagonal(expected_sims, -np.inf)
+        np.fill_diagonal(actual_sims, -np.inf)
+        expected_top = np.argsort(-expected_sims, axis=1)[:, :k]
+        actual_top = np.argsort(-actual_sims, axis=1)[:, :k]
+        overlap = float(
+            np.mean(
+                [
+                    len(set(e) & set(a)) / k
+                    for e, a in zip(expected_top.tolist(), actual_top.tolist())
+                ]
+            )
+        )
+
+    return {
+        "texts": len(texts),
+        "mean_cosine": round(float(cosine.mean()), 6),
+        "min_cosine": round(float(cosine.min()), 6),
+        "p01_cosine": round(float(np.percentile(cosine, 1)), 6),
+        f"top{k}_overlap": round(overlap, 4),
+    }
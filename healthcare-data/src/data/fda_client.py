@@ -1,86 +1,154 @@
+import functools
+import logging
 import os
-from typing import Dict, List
+import threading
+from typing import Dict, List, Optional
 from urllib.parse import quote
 
 import requests
 from dotenv import load_dotenv
 
+from ..utils.metrics import count, timed
+from .response_cache import ResponseCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FDA_BASE_URL = "https://api.fda.gov/drug"
+NO_INTERACTIONS = "No interaction information available"
+
+
+def symptom_search_params(api_key: str, symptoms: List[str], limit: int) -> Dict:
+    """Build label.json query parameters for a symptom search"""
+    # Convert symptoms list to search query and URL encode
+    search_terms = " AND ".join(quote(term) for term in symptoms)
+    return {
+        "api_key": api_key,
+        "search": f'indications_and_usage:"{search_terms}"',
+        "limit": limit,
+    }
+
+
+def interaction_search_params(api_key: str, drug_name: str) -> Dict:
+    """Build label.json query parameters for a drug name lookup"""
+    return {
+        "api_key": api_key,
+        "search": f'openfda.brand_name:"{drug_name}" OR openfda.generic_name:"{drug_name}"',
+        "limit": 1,
+    }
+
+
+def format_medication(result: Dict) -> Dict:
+    """Extract the fields we use from a raw label.json result"""
+    return {
+        "brand_name": result.get("openfda", {}).get("brand_name", ["Unknown"])[0],
+        "generic_name": result.get("openfda", {}).get("generic_name", ["Unknown"])[0],
+        "indications": result.get(
+            "indications_and_usage", ["No indication available"]
+        )[0],
+        "warnings": result.get("warnings", ["No warnings available"])[0],
+        "dosage": result.get(
+            "dosage_and_administration", ["No dosage information available"]
+        )[0],
+        "drug_interactions": result.get("drug_interactions", [NO_INTERACTIONS]),
+    }
+
+
+def format_interactions(results: List[Dict]) -> List[str]:
+    """Extract drug interaction text from raw label.json results"""
+    if results:
+        return results[0].get("drug_interactions", [NO_INTERACTIONS])
+    return [NO_INTERACTIONS]
+
 
 class FDAClient:
     """Client for interacting with OpenFDA API"""
 
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         load_dotenv()
         self.api_key = os.getenv("FDA_API_KEY")
-        self.base_url = "https://api.fda.gov/drug"
+        self.base_url = os.getenv("FDA_BASE_URL", FDA_BASE_URL)
+        self.timeout = float(os.getenv("FDA_TIMEOUT", "10"))
 
         if not self.api_key:
             raise ValueError("FDA_API_KEY not found in environment variables")
 
-    def search_medications(self, symptoms: List[str], limit: int = 5) -> List[Dict]:
-        """Search medications based on symptoms"""
-        try:
-            # Convert symptoms list to search query and URL encode
-            search_terms = " AND ".join(quote(term) for term in symptoms)
+        # Keep-alive connection pool shared by all requests
+        self.session = requests.Session()
+
+        # Response cache with single-flight coalescing of identical requests
+        self.cache = cache or ResponseCache.from_env()
+        self.single_flight = SingleFlight()
+        self.upstream_calls = 0
+
+    def _fetch_upstream(self, endpoint: str, key: str, params: Dict) -> List[Dict]:
+        """Call label.json and store the results in the response cache"""
+        self.upstream_calls += 1
+        with timed("fda_call"):
+            response = self.session.get(
+                f"{self.base_url}/label.json", params=params, timeout=self.timeout
+            )
+        count("fda_responses_total", status=response.status_code)
+        # openFDA answers 404 when nothing matches
+        if response.status_code == 404:
+            results = []
+        else:
+            response.raise_for_status()
+            results = response.json().get("results", [])
 
-            url = f"{self.base_url}/label.json"
-            params = {
-                "api_key": self.api_key,
-                "search": f'indications_and_usage:"{search_terms}"',
-                "limit": limit,
-            }
+        if self.cache is not None:
+            self.cache.set(key, endpoint, results)
+        return results
+
+    def _get_results(self, endpoint: str, params: Dict) -> List[Dict]:
+        """Return label.json results, serving from cache where possible"""
+        key = ResponseCache.make_key(endpoint, params)
+        fetch = functools.partial(self._fetch_upstream, endpoint, key, params)
+
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                results, stale = cached
+                if stale:
+                    # Serve the stale copy and revalidate in the background
+                    threading.Thread(
+                        target=self._revalidate, args=(key, fetch), daemon=True
+                    ).start()
+                return results
+
+        return self.single_flight.do(key, fetch)
+
+    def _revalidate(self, key: str, fetch):
+        try:
+            self.single_flight.do(key, fetch)
+        except requests.exceptions.RequestException as e:
+            logger.error("Error refreshing OpenFDA response: %s", e)
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+    def cache_stats(self) -> Dict:
+        """Return response cache and upstream call counters"""
+        stats = self.cache.stats() if self.cache is not None else {}
+        stats["upstream_calls"] = self.upstream_calls
+        stats["coalesced"] = self.single_flight.coalesced
+        return stats
 
-            results = response.json().get("results", [])
+    def search_medications(self, symptoms: List[str], limit: int = 5) -> List[Dict]:
+        """Search medications based on symptoms"""
+        try:
+            params = symptom_search_params(self.api_key, symptoms, limit)
+            results = self._get_results("search", params)
 
             # Format the response
-            medications = []
-            for result in results:
-                medication = {
-                    "brand_name": result.get("openfda", {}).get(
-                        "brand_name", ["Unknown"]
-                    )[0],
-                    "generic_name": result.get("openfda", {}).get(
-                        "generic_name", ["Unknown"]
-                    )[0],
-                    "indications": result.get(
-                        "indications_and_usage", ["No indication available"]
-                    )[0],
-                    "warnings": result.get("warnings", ["No warnings available"])[0],
-                    "dosage": result.get(
-                        "dosage_and_administration", ["No dosage information available"]
-                    )[0],
-                }
-                medications.append(medication)
-
-            return medications
+            return [format_medication(result) for result in results]
 
         except requests.exceptions.RequestException as e:
-            print(f"Error querying OpenFDA API: {str(e)}")
+            logger.error("Error querying OpenFDA API: %s", e)
             return []
 
     def get_drug_interactions(self, drug_name: str) -> List[str]:
         """Get drug interactions for a specific medication"""
         try:
-            url = f"{self.base_url}/label.json"
-            params = {
-                "api_key": self.api_key,
-                "search": f'openfda.brand_name:"{drug_name}" OR openfda.generic_name:"{drug_name}"',
-                "limit": 1,
-            }
-
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-
-            results = response.json().get("results", [])
-            if results:
-                return results[0].get(
-                    "drug_interactions", ["No interaction information available"]
-                )
-            return ["No interaction information available"]
+            params = interaction_search_params(self.api_key, drug_name)
+            return format_interactions(self._get_results("interactions", params))
 
         except requests.exceptions.RequestException as e:
-            print(f"Error querying OpenFDA API: {str(e)}")
+            logger.error("Error querying OpenFDA API: %s", e)
             return ["Error retrieving interaction information"]
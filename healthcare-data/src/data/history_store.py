@@ -0,0 +1,393 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.sql import text
+
+from .ann_index import column_type
+
+SCHEMA = "health"
+QUERY_TABLE = "health.query_history"
+RESULT_TABLE = "health.search_results"
+DAILY_TABLE = "health.query_daily_stats"
+MEDICATION_DAILY_TABLE = "health.medication_daily_stats"
+MEDICATION_TABLE = "health.medication_cache"
+
+EMBEDDING_INDEX = "idx_query_history_embedding"
+# ivfflat is not offered: each new daily partition would train its lists
+# on an empty table
+EMBEDDING_INDEX_TYPES = ["none", "hnsw"]
+
+_BOUNDS = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def _midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+def _bound(value: str) -> datetime:
+    if value == "MINVALUE":
+        return datetime.min
+    if value == "MAXVALUE":
+        return datetime.max
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def partition_bounds(conn, table: str) -> List[Tuple[str, datetime, datetime]]:
+    """(name, lower, upper) of each range partition; the default is left out"""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:table AS regclass)"
+        ),
+        {"table": table},
+    ).fetchall()
+    bounds = []
+    for name, expression in rows:
+        match = _BOUNDS.search(expression or "")
+        if match:
+            bounds.append((name, _bound(match.group(1)), _bound(match.group(2))))
+    return bounds
+
+
+def _partition_table(conn, table):
+    """Turn an unpartitioned table from an older schema into a partition
+
+    The existing rows are not copied: the old table is renamed and
+    attached as one partition holding everything up to the end of today,
+    which the retention policy drops once its newest day has expired.
+    """
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table.fullname},
+    ).scalar()
+    if relkind != "r":
+        return
+
+    legacy = f"{table.name}_legacy"
+    conn.execute(text(f"ALTER TABLE {table.fullname} RENAME TO {legacy}"))
+    # The partitioned table takes over these names; attaching the old rows
+    # builds the (id, created_at) key on them
+    conn.execute(
+        text(
+            f"ALTER TABLE {SCHEMA}.{legacy} DROP CONSTRAINT IF EXISTS {table.name}_pkey"
+        )
+    )
+    indexes = conn.execute(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = :schema AND tablename = :table"
+        ),
+        {"schema": SCHEMA, "table": legacy},
+    ).fetchall()
+    for (index,) in indexes:
+        conn.execute(text(f"DROP INDEX {SCHEMA}.{index}"))
+    # Rows without a timestamp cannot be placed in a range, nor aged out
+    conn.execute(text(f"DELETE FROM {SCHEMA}.{legacy} WHERE created_at IS NULL"))
+    conn.execute(
+        text(
+            f"ALTER TABLE {SCHEMA}.{legacy} ALTER COLUMN id SET NOT NULL, "
+            "ALTER COLUMN created_at SET NOT NULL"
+        )
+    )
+
+    latest = conn.execute(text(f"SELECT max(created_at) FROM {SCHEMA}.{legacy}"))
+    latest = latest.scalar()
+    end = max(date.today(), latest.date() if latest else date.min)
+    end = _midnight(end + timedelta(days=1))
+
+    table.create(conn)
+    if "embedding" in table.c:
+        # query_history.embedding may have been migrated to halfvec
+        embedding_type = column_type(conn, f"{SCHEMA}.{legacy}")
+        conn.execute(
+            text(
+                f"ALTER TABLE {table.fullname} "
+                f"ALTER COLUMN embedding TYPE {embedding_type}"
+            )
+        )
+    conn.execute(
+        text(
+            f"ALTER TABLE {table.fullname} ATTACH PARTITION {SCHEMA}.{legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{end}')"
+        )
+    )
+
+
+def ensure_partitions(
+    conn, table: str, days_ahead: int = 7, today: Optional[date] = None
+) -> List[str]:
+    """Create the daily partitions from today through days_ahead days on
+
+    Writes for a day without a partition land in the default partition;
+    those days get a partition too, and their rows are moved into it.
+    Returns the names of the partitions created.
+    """
+    today = today or date.today()
+    name = table.split(".")[1]
+    default = f"{table}_default"
+    # Serialise with other processes creating the same partitions
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:table))"), {"table": table}
+    )
+
+    stray = conn.execute(text(f"SELECT DISTINCT date(created_at) FROM {default}"))
+    days = {today + timedelta(days=offset) for offset in range(days_ahead + 1)}
+    days.update(day for (day,) in stray)
+
+    bounds = partition_bounds(conn, table)
+    created = []
+    for day in sorted(days):
+        start, end = _midnight(day), _midnight(day + timedelta(days=1))
+        if any(lower <= start < upper for _, lower, upper in bounds):
+            continue
+        partition = f"{SCHEMA}.{name}_p{day:%Y%m%d}"
+        conn.execute(
+            text(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)")
+        )
+        conn.execute(
+            text(f"""
+                WITH moved AS (
+                    DELETE FROM {default}
+                    WHERE created_at >= :start AND created_at < :end
+                    RETURNING *
+                )
+                INSERT INTO {partition} SELECT * FROM moved
+            """),
+            {"start": start, "end": end},
+        )
+        conn.execute(
+            text(
+                f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        )
+        created.append(partition)
+    return created
+
+
+def drop_expired_partitions(
+    conn, table: str, retention_days: int, today: Optional[date] = None
+) -> List[str]:
+    """Drop the partitions holding only rows older than retention_days
+
+    Dropping a partition is a catalog change, unlike a DELETE, so it
+    leaves no dead rows to vacuum. Returns the names of the partitions
+    dropped.
+    """
+    cutoff = _midnight((today or date.today()) - timedelta(days=retention_days))
+    dropped = []
+    for name, _, upper in partition_bounds(conn, table):
+        if upper <= cutoff:
+            conn.execute(text(f"DROP TABLE {SCHEMA}.{name}"))
+            dropped.append(f"{SCHEMA}.{name}")
+    conn.execute(
+        text(f"DELETE FROM {table}_default WHERE created_at < :cutoff"),
+        {"cutoff": cutoff},
+    )
+    return dropped
+
+
+def set_embedding_index(conn, index_type: str = "none", table: str = QUERY_TABLE):
+    """Create or drop the HNSW index on query_history embeddings
+
+    Without it, near-duplicate lookups scan the embeddings of the recent
+    partitions they are limited to, which keeps history inserts cheap.
+    """
+    if index_type not in EMBEDDING_INDEX_TYPES:
+        raise ValueError(f"Unknown history index type: {index_type}")
+    if index_type == "none":
+        conn.execute(text(f"DROP INDEX IF EXISTS {SCHEMA}.{EMBEDDING_INDEX}"))
+        return
+    embedding_type = column_type(conn, table) or "vector"
+    opclass = (
+        "halfvec_cosine_ops"
+        if embedding_type.startswith("halfvec")
+        else "vector_cosine_ops"
+    )
+    # An index under this name from an older schema may be ivfflat with the
+    # default L2 operator class, which cannot serve cosine-distance lookups
+    definition = conn.execute(
+        text(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = :schema AND indexname = :index"
+        ),
+        {"schema": SCHEMA, "index": EMBEDDING_INDEX},
+    ).scalar()
+    if definition and not ("hnsw" in definition and opclass in definition):
+        conn.execute(text(f"DROP INDEX {SCHEMA}.{EMBEDDING_INDEX}"))
+    conn.execute(
+        text(
+            f"CREATE INDEX IF NOT EXISTS {EMBEDDING_INDEX} ON {table} "
+            f"USING hnsw (embedding {opclass})"
+        )
+    )
+
+
+def create_history_store(
+    conn,
+    query_table,
+    result_table,
+    embedding_index: str = "none",
+    days_ahead: int = 7,
+):
+    """Partition query_history and search_results by day
+
+    Both are range-partitioned on created_at, with a default partition
+    catching writes for days that have no partition yet. Tables from
+    older schemas keep their rows in a single legacy partition.
+    """
+    for table in (query_table, result_table):
+        _partition_table(conn, table)
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {table.fullname}_default "
+                f"PARTITION OF {table.fullname} DEFAULT"
+            )
+        )
+        ensure_partitions(conn, table.fullname, days_ahead)
+    set_embedding_index(conn, embedding_index, query_table.fullname)
+
+
+def rollup(conn, since: datetime, until: datetime) -> int:
+    """Recompute the daily rollups for rows created in [since, until)
+
+    Rerunning it for a day replaces that day's figures, so the current
+    day can be rolled up repeatedly as it fills. Returns the number of
+    days written.
+    """
+    window = {"since": since, "until": until}
+    days = conn.execute(
+        text(f"""
+            INSERT INTO {DAILY_TABLE} (
+                day, queries, queries_with_results, results, distinct_queries,
+                updated_at
+            )
+            SELECT
+                date(created_at),
+                count(*),
+                count(*) FILTER (WHERE results_count > 0),
+                coalesce(sum(results_count), 0),
+                count(DISTINCT lower(query_text)),
+                now()
+            FROM {QUERY_TABLE}
+            WHERE created_at >= :since AND created_at < :until
+            GROUP BY 1
+            ON CONFLICT (day) DO UPDATE SET
+                queries = EXCLUDED.queries,
+                queries_with_results = EXCLUDED.queries_with_results,
+                results = EXCLUDED.results,
+                distinct_queries = EXCLUDED.distinct_queries,
+                updated_at = EXCLUDED.updated_at
+        """),
+        window,
+    ).rowcount
+    conn.execute(
+        text(
+            f"DELETE FROM {MEDICATION_DAILY_TABLE} "
+            "WHERE day >= date(:since) AND day < date(:until)"
+        ),
+        window,
+    )
+    conn.execute(
+        text(f"""
+            INSERT INTO {MEDICATION_DAILY_TABLE} (
+                day, medication_id, appearances, top_hits, avg_similarity
+            )
+            SELECT
+                date(created_at),
+                medication_id,
+                count(*),
+                count(*) FILTER (WHERE rank = 1),
+                avg(similarity_score)
+            FROM {RESULT_TABLE}
+            WHERE created_at >= :since AND created_at < :until
+            GROUP BY 1, 2
+        """),
+        window,
+    )
+    return days
+
+
+def rollup_pending(conn, today: Optional[date] = None) -> int:
+    """Roll up every day since the last rollup, through today
+
+    The last day already rolled up is recomputed, since it may have been
+    rolled up before it was over.
+    """
+    today = today or date.today()
+    since = conn.execute(text(f"SELECT max(day) FROM {DAILY_TABLE}")).scalar()
+    if since is None:
+        first = conn.execute(text(f"SELECT min(created_at) FROM {QUERY_TABLE}"))
+        first = first.scalar()
+        if first is None:
+            return 0
+        since = first.date()
+    return rollup(conn, _midnight(since), _midnight(today + timedelta(days=1)))
+
+
+def maintain_history(
+    engine, retention_days: int = 90, days_ahead: int = 7
+) -> Dict[str, List]:
+    """Create upcoming partitions, roll up recent days, then drop old ones
+
+    Rollups run first, so a partition is only dropped once its days are
+    in the rollup tables.
+    """
+    report = {"created": [], "rolled_up_days": 0, "dropped": []}
+    with engine.begin() as conn:
+        for table in (QUERY_TABLE, RESULT_TABLE):
+            report["created"] += ensure_partitions(conn, table, days_ahead)
+    with engine.begin() as conn:
+        report["rolled_up_days"] = rollup_pending(conn)
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        for table in (QUERY_TABLE, RESULT_TABLE):
+            report["dropped"] += drop_expired_partitions(conn, table, retention_days)
+    return report
+
+
+def daily_stats(conn, days: int = 7) -> List[Dict]:
+    """Query counts and hit rate per day from the rollups"""
+    rows = conn.execute(
+        text(
+            "SELECT day, queries, queries_with_results, results, distinct_queries "
+            f"FROM {DAILY_TABLE} WHERE day > current_date - :days ORDER BY day"
+        ),
+        {"days": days},
+    ).mappings()
+    return [
+        {
+            **row,
+            "day": row["day"].isoformat(),
+            "hit_rate": row["queries_with_results"] / row["queries"]
+            if row["queries"]
+            else 0.0,
+        }
+        for row in rows
+    ]
+
+
+def top_medications(conn, days: int = 7, limit: int = 10) -> List[Dict]:
+    """Medications returned most often over the last days, from the rollups"""
+    rows = conn.execute(
+        text(f"""
+            SELECT
+                s.medication_id,
+                m.brand_name,
+                m.generic_name,
+                sum(s.appearances)::int AS appearances,
+                sum(s.top_hits)::int AS top_hits,
+                sum(s.avg_similarity * s.appearances) / sum(s.appearances)
+                    AS avg_similarity
+            FROM {MEDICATION_DAILY_TABLE} s
+            LEFT JOIN {MEDICATION_TABLE} m ON m.id = s.medication_id
+            WHERE s.day > current_date - :days
+            GROUP BY s.medication_id, m.brand_name, m.generic_name
+            ORDER BY appearances DESC
+            LIMIT :limit
+        """),
+        {"days": days, "limit": limit},
+    ).mappings()
+    return [{**row, "medication_id": str(row["medication_id"])} for row in rows]
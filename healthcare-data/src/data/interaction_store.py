@@ -0,0 +1,130 @@
+import re
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy.sql import text
+
+TABLE = "health.medication_cache"
+DETAILS_TABLE = "health.medication_details"
+
+# Exact, case-insensitive name lookups for regimen checks
+INDEXES = {
+    "idx_medication_cache_brand_lower": "(lower(brand_name))",
+    "idx_medication_cache_generic_lower": "(lower(generic_name))",
+}
+
+EXCERPT_CHARS = 240
+
+
+def create_interaction_store(
+    conn, table: str = TABLE, details_table: str = DETAILS_TABLE
+):
+    """Add the drug_interactions column, backfill it and index the names
+
+    Labels loaded before the column existed kept their interaction text in
+    the full label JSON, so it is copied over rather than refetched.
+    """
+    conn.execute(
+        text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS drug_interactions JSONB")
+    )
+    conn.execute(
+        text(
+            f"UPDATE {table} m SET drug_interactions = d.raw_data->'drug_interactions' "
+            f"FROM {details_table} d WHERE d.medication_id = m.id "
+            "AND m.drug_interactions IS NULL AND d.raw_data ? 'drug_interactions'"
+        )
+    )
+    for name, expression in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {expression}"))
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def find_mentions(
+    interactions: Dict[str, List[str]], aliases: Dict[str, Set[str]]
+) -> List[Dict]:
+    """Find pairs where one drug's interaction text names another drug
+
+    aliases maps each drug to the names it may appear under (what the user
+    typed plus the brand and generic names it resolved to). Returns one
+    entry per (drug, mentioned drug) pair with the surrounding text.
+    """
+    patterns = {
+        drug: re.compile(
+            r"\b(?:"
+            + "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+            + r")\b",
+            re.IGNORECASE,
+        )
+        for drug, names in aliases.items()
+        if names
+    }
+
+    mentions = []
+    for drug, texts in interactions.items():
+        for other, pattern in patterns.items():
+            if other == drug:
+                continue
+            for section in texts:
+                match = pattern.search(section)
+                if match is None:
+                    continue
+                start = max(0, match.start() - EXCERPT_CHARS // 2)
+                mentions.append(
+                    {
+                        "drug": drug,
+                        "mentions": other,
+                        "excerpt": section[start : start + EXCERPT_CHARS].strip(),
+                    }
+                )
+                break
+    return mentions
+
+
+class InteractionStore:
+    """Drug interaction text kept with each cached medication
+
+    lookup() resolves a whole regimen by brand or generic name in one
+    query, so checking ten drugs costs one database round trip instead of
+    ten OpenFDA calls. Names with no cached label are reported as missing
+    for the caller to fetch.
+    """
+
+    def __init__(self, engine, table: str = TABLE):
+        self.engine = engine
+        self.statement = text(f"""
+            SELECT DISTINCT ON (w.name)
+                w.name, m.brand_name, m.generic_name, m.drug_interactions
+            FROM unnest(CAST(:names AS text[])) AS w(name)
+            JOIN {table} m
+                ON lower(m.brand_name) = w.name OR lower(m.generic_name) = w.name
+            WHERE m.drug_interactions IS NOT NULL
+            ORDER BY w.name, lower(m.brand_name) = w.name DESC, m.updated_at DESC
+        """)
+
+    def lookup(self, drug_names: Iterable[str]) -> Dict:
+        """Return cached interactions for the drugs, plus the names missed
+
+        The result maps each requested name to its interaction text under
+        "interactions", the brand and generic names it matched under
+        "aliases", and lists unmatched names under "missing".
+        """
+        requested = {normalize_name(name): name for name in drug_names if name}
+        if not requested:
+            return {"interactions": {}, "aliases": {}, "missing": []}
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(self.statement, {"names": list(requested)}).fetchall()
+
+        interactions = {}
+        aliases = {}
+        for name, brand_name, generic_name, texts in rows:
+            drug = requested[name]
+            interactions[drug] = texts
+            # Labels without openfda names are stored as "Unknown"
+            aliases[drug] = {
+                n for n in (drug, brand_name, generic_name) if n and n != "Unknown"
+            }
+        missing = [drug for drug in requested.values() if drug not in interactions]
+        return {"interactions": interactions, "aliases": aliases, "missing": missing}
@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy.sql import text
+
+TABLE = "health.medication_cache"
+DETAILS_TABLE = "health.medication_details"
+
+# Characters of indications and warnings kept in the search projection
+SUMMARY_CHARS = 300
+
+
+def medication_summary(medication: Dict) -> Dict:
+    """The lean projection search returns instead of the full label"""
+    return {
+        "brand_name": medication.get("brand_name"),
+        "generic_name": medication.get("generic_name"),
+        "indications": (medication.get("indications") or "")[:SUMMARY_CHARS],
+        "warnings": (medication.get("warnings") or "")[:SUMMARY_CHARS],
+    }
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    schema, name = table.split(".")
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = :schema AND table_name = :name "
+                "AND column_name = :column"
+            ),
+            {"schema": schema, "name": name, "column": column},
+        ).scalar()
+    )
+
+
+def create_details_store(conn, compression: Optional[str] = None):
+    """Move full label JSON out of medication_cache into medication_details
+
+    medication_cache keeps the embedding, names and a summary projection,
+    so searches read small rows that stay cached in shared_buffers. The
+    full label is copied to medication_details (compressed with
+    compression, e.g. "lz4", when given) and raw_data is dropped from the
+    hot table. The space it used is reclaimed by the next VACUUM FULL.
+    """
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS summary JSONB"))
+    if compression:
+        conn.execute(
+            text(
+                f"ALTER TABLE {DETAILS_TABLE} "
+                f"ALTER COLUMN raw_data SET COMPRESSION {compression}"
+            )
+        )
+    if not _has_column(conn, TABLE, "raw_data"):
+        return
+
+    conn.execute(
+        text(f"""
+            INSERT INTO {DETAILS_TABLE} (medication_id, raw_data, updated_at)
+            SELECT id, raw_data, updated_at FROM {TABLE}
+            WHERE raw_data IS NOT NULL
+            ON CONFLICT (medication_id) DO NOTHING
+        """)
+    )
+    conn.execute(
+        text(f"""
+            UPDATE {TABLE} SET summary = jsonb_build_object(
+                'brand_name', brand_name,
+                'generic_name', generic_name,
+                'indications', left(coalesce(raw_data->>'indications', ''), :chars),
+                'warnings', left(coalesce(raw_data->>'warnings', ''), :chars)
+            )
+            WHERE summary IS NULL
+        """),
+        {"chars": SUMMARY_CHARS},
+    )
+    conn.execute(text(f"ALTER TABLE {TABLE} DROP COLUMN raw_data"))
+
+
+def load_details(conn, medication_ids: List) -> Dict[str, Dict]:
+    """Full label JSON for the given medication ids, keyed by id string"""
+    if not medication_ids:
+        return {}
+    rows = conn.execute(
+        text(
+            f"SELECT medication_id, raw_data FROM {DETAILS_TABLE} "
+            "WHERE medication_id = ANY(CAST(:ids AS uuid[]))"
+        ),
+        {"ids": [str(medication_id) for medication_id in medication_ids]},
+    ).fetchall()
+    return {str(medication_id): raw_data for medication_id, raw_data in rows}
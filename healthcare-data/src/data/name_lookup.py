@@ -0,0 +1,164 @@
+import re
+from typing import Dict, List, Tuple
+
+from sqlalchemy.sql import text
+
+from .vector_store import SearchHit
+
+TABLE = "health.medication_cache"
+
+# Must match the indexed expression exactly for the planner to use the index
+DOCUMENT = (
+    "to_tsvector('english', coalesce(brand_name, '') || ' ' || "
+    "coalesce(generic_name, '') || ' ' || coalesce(indications, ''))"
+)
+
+INDEXES = {
+    "idx_medication_cache_brand_trgm": "USING gin (lower(brand_name) gin_trgm_ops)",
+    "idx_medication_cache_generic_trgm": (
+        "USING gin (lower(generic_name) gin_trgm_ops)"
+    ),
+    "idx_medication_cache_document": f"USING gin (({DOCUMENT}))",
+}
+
+_NAME_PATTERN = re.compile(r"^[\w][\w\-./ ]*$")
+
+
+def create_lexical_indexes(conn, table: str = TABLE):
+    """Create pg_trgm name indexes and the full-text document index"""
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+    for name, definition in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}"))
+
+
+def looks_like_name(query: str, max_words: int = 3) -> bool:
+    """Whether a query is short and plain enough to be a drug name"""
+    query = query.strip()
+    return (
+        len(query) >= 3
+        and len(query.split()) <= max_words
+        and bool(_NAME_PATTERN.match(query))
+    )
+
+
+class NameLookup:
+    """Lexical medication search that runs ahead of vector search
+
+    search() matches brand and generic names with pg_trgm similarity, so
+    exact names score 1.0 and misspellings ("ibuprofin") still match.
+    search_text() ranks full-text matches over names and indications, used
+    to fuse lexical and vector scores for mixed queries. Both are served
+    by the GIN indexes from create_lexical_indexes.
+    """
+
+    def __init__(self, engine, min_similarity: float = 0.5, table: str = TABLE):
+        self.engine = engine
+        self.min_similarity = min_similarity
+        self.table = table
+        self.name_statement = text(f"""
+            SELECT
+                id,
+                summary,
+                GREATEST(
+                    similarity(lower(brand_name), :query),
+                    similarity(lower(generic_name), :query)
+                ) AS score
+            FROM {table}
+            WHERE lower(brand_name) % :query OR lower(generic_name) % :query
+            ORDER BY score DESC, brand_name
+            LIMIT :limit
+        """)
+        # ts_rank_cd normalization 32 maps ranks into [0, 1)
+        self.text_statement = text(f"""
+            SELECT id, summary, ts_rank_cd({DOCUMENT}, query, 32) AS score
+            FROM {table}, websearch_to_tsquery('english', :query) query
+            WHERE {DOCUMENT} @@ query
+            ORDER BY score DESC
+            LIMIT :limit
+        """)
+
+    def search(self, query: str, limit: int) -> List[SearchHit]:
+        """Return medications whose name is within min_similarity of query"""
+        with self.engine.begin() as conn:
+            # The % operator filters on this threshold and can use the index
+            conn.execute(
+                text("SELECT set_config('pg_trgm.similarity_threshold', :t, true)"),
+                {"t": str(self.min_similarity)},
+            )
+            rows = conn.execute(
+                self.name_statement,
+                {"query": query.strip().lower(), "limit": limit},
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def search_text(self, query: str, limit: int) -> List[SearchHit]:
+        """Return full-text matches on names and indications, best first"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                self.text_statement, {"query": query, "limit": limit}
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+
+def merge_name_hits(
+    vector_hits: List[SearchHit],
+    name_hits: List[SearchHit],
+    name_weight: float,
+    limit: int,
+) -> List[SearchHit]:
+    """Merge near name matches into vector results
+
+    Medications keep their vector similarity, None for those only found
+    by name, and carry their trigram score as summary["name_score"]. They
+    are ordered by (1 - w) * similarity + w * name score, with 0 for
+    whichever side did not return them.
+    """
+    names = {str(medication_id): score for medication_id, _, score in name_hits}
+    merged = {}
+    for medication_id, medication, similarity in vector_hits:
+        key = str(medication_id)
+        if key in names:
+            medication = {**medication, "name_score": names[key]}
+        merged[key] = (medication_id, medication, similarity)
+    for medication_id, medication, score in name_hits:
+        key = str(medication_id)
+        if key not in merged:
+            merged[key] = (medication_id, {**medication, "name_score": score}, None)
+
+    def fused(hit: SearchHit) -> float:
+        return (1 - name_weight) * (hit[2] or 0.0) + name_weight * hit[1].get(
+            "name_score", 0.0
+        )
+
+    return sorted(merged.values(), key=fused, reverse=True)[:limit]
+
+
+def fuse_scores(
+    vector_hits: List[SearchHit],
+    lexical_hits: List[SearchHit],
+    lexical_weight: float,
+    limit: int,
+) -> List[SearchHit]:
+    """Blend vector similarity and lexical rank into one ordering
+
+    Each medication scores (1 - w) * similarity + w * lexical score, with 0
+    for whichever side did not return it.
+    """
+    scores: Dict[str, Tuple[object, Dict, float, float]] = {}
+    for medication_id, medication, similarity in vector_hits:
+        scores[str(medication_id)] = (medication_id, medication, similarity, 0.0)
+    for medication_id, medication, score in lexical_hits:
+        key = str(medication_id)
+        similarity = scores[key][2] if key in scores else 0.0
+        scores[key] = (medication_id, medication, similarity, score)
+
+    fused = [
+        (
+            medication_id,
+            medication,
+            (1 - lexical_weight) * similarity + lexical_weight * score,
+        )
+        for medication_id, medication, similarity, score in scores.values()
+    ]
+    fused.sort(key=lambda hit: hit[2], reverse=True)
+    return fused[:limit]
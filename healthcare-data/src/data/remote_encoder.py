@@ -0,0 +1,119 @@
+import json
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+# Frames are a 4-byte big-endian length followed by the payload. Requests
+# are JSON; responses start with a status byte, then float32 embeddings
+# (encode) or JSON (info, errors).
+HEADER = struct.Struct("!I")
+STATUS_OK = b"\x00"
+STATUS_ERROR = b"\x01"
+
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return _recv_exactly(sock, size)
+
+
+class RemoteEncoder:
+    """Encoder that asks a shared embedding server process for embeddings
+
+    Lets several worker processes use one copy of the model, held by
+    src/embedding_server.py, instead of loading their own. The server
+    batches requests arriving from all workers together. encode() accepts
+    the same arguments as SentenceTransformer.encode. Each thread keeps its
+    own connection to the Unix socket; a dropped connection is retried
+    once on a fresh one.
+    """
+
+    def __init__(
+        self, path: str, timeout: float = 30.0, expected_model_id: Optional[str] = None
+    ):
+        self.path = path
+        self.timeout = timeout
+        self.expected_model_id = expected_model_id
+        self.local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise ConnectionError(
+                f"No embedding server at {self.path}; run src/embedding_server.py"
+            ) from e
+
+        if self.expected_model_id:
+            # Cached embeddings are keyed by model id, so a server running a
+            # different backend would mix vectors from two models. Checked on
+            # every connection, since the server may have been restarted.
+            send_frame(sock, json.dumps({"op": "info"}).encode())
+            info = json.loads(recv_frame(sock)[1:])
+            if info.get("model_id") != self.expected_model_id:
+                sock.close()
+                raise RuntimeError(
+                    f"Embedding server at {self.path} runs {info.get('model_id')} "
+                    f"but this process expects {self.expected_model_id}"
+                )
+        return sock
+
+    def _request(self, message: Dict) -> bytes:
+        payload = json.dumps(message).encode()
+        for attempt in range(2):
+            sock = getattr(self.local, "sock", None)
+            if sock is None:
+                sock = self.local.sock = self._connect()
+            try:
+                send_frame(sock, payload)
+                response = recv_frame(sock)
+                break
+            except OSError:
+                sock.close()
+                self.local.sock = None
+                if attempt:
+                    raise
+        if response[:1] == STATUS_ERROR:
+            raise RuntimeError(f"Embedding server error: {response[1:].decode()}")
+        return response[1:]
+
+    def info(self) -> Dict:
+        """Model id, dimension and counters reported by the server"""
+        return json.loads(self._request({"op": "info"}))
+
+    def encode(
+        self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        body = self._request({"op": "encode", "texts": texts})
+        embeddings = np.frombuffer(body, dtype=np.float32).reshape(len(texts), -1)
+        return embeddings[0] if single else embeddings
+
+    def close(self):
+        sock = getattr(self.local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self.local.sock = None
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..utils.metrics import cache_event
+
+# Query parameters that never change the response
+IGNORED_PARAMS = {"api_key"}
+
+
+class ResponseCache:
+    """SQLite-backed cache of OpenFDA responses with per-endpoint TTLs
+
+    Entries younger than their endpoint's TTL are fresh. Entries past the
+    TTL but within the stale window are still served, flagged as stale so
+    the caller can revalidate them in the background.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 86400,
+        stale_ttl: float = 86400,
+    ):
+        self.path = path
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                body TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        self.purge_expired()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Build a cache from environment settings, or None if disabled"""
+        path = os.getenv("FDA_CACHE_PATH", ".cache/fda_responses.sqlite")
+        if not path:
+            return None
+        return cls(
+            path,
+            ttls={
+                "search": float(os.getenv("FDA_CACHE_SEARCH_TTL", "86400")),
+                "interactions": float(os.getenv("FDA_CACHE_INTERACTIONS_TTL", "604800")),
+            },
+            stale_ttl=float(os.getenv("FDA_CACHE_STALE_TTL", "86400")),
+        )
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict) -> str:
+        """Hash the endpoint and normalized query parameters"""
+        normalized = {
+            name: " ".join(str(value).lower().split())
+            for name, value in params.items()
+            if name not in IGNORED_PARAMS
+        }
+        payload = json.dumps([endpoint, normalized], sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict], bool]]:
+        """Return (results, is_stale) for a cached response, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT endpoint, fetched_at, body FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                cache_event("fda_response", "miss")
+                return None
+
+            endpoint, fetched_at, body = row
+            age = time.time() - fetched_at
+            ttl = self.ttls.get(endpoint, self.default_ttl)
+            if age > ttl + self.stale_ttl:
+                self.misses += 1
+                cache_event("fda_response", "expired")
+                return None
+            if age > ttl:
+                self.stale_hits += 1
+                cache_event("fda_response", "stale_hit")
+                return json.loads(body), True
+            self.hits += 1
+            cache_event("fda_response", "hit")
+            return json.loads(body), False
+
+    def set(self, key: str, endpoint: str, results: List[Dict]):
+        """Store a response, replacing any previous entry"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, fetched_at, body) "
+                "VALUES (?, ?, ?, ?)",
+                (key, endpoint, time.time(), json.dumps(results)),
+            )
+            self.conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete entries past their stale window and return how many"""
+        now = time.time()
+        deleted = 0
+        with self.lock:
+            endpoints = self.conn.execute(
+                "SELECT DISTINCT endpoint FROM responses"
+            ).fetchall()
+            for (endpoint,) in endpoints:
+                ttl = self.ttls.get(endpoint, self.default_ttl) + self.stale_ttl
+                cursor = self.conn.execute(
+                    "DELETE FROM responses WHERE endpoint = ? AND fetched_at < ?",
+                    (endpoint, now - ttl),
+                )
+                deleted += cursor.rowcount
+            self.conn.commit()
+        return deleted
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters"""
+        with self.lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls from threads into one"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[str, Dict] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], List[Dict]]) -> List[Dict]:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call["event"].set()
+
+
+class AsyncSingleFlight:
+    """Collapse concurrent identical coroutine calls into one
+
+    A caller that is cancelled stops waiting without cancelling the shared
+    call for the others; once the last caller has left, the call itself
+    is cancelled so nobody pays for a request whose result is unwanted.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Future] = {}
+        self.waiters: Dict[asyncio.Future, int] = {}
+        self.coalesced = 0
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[List[Dict]]]
+    ) -> List[Dict]:
+        future = self.calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(fn())
+            self.calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        self.waiters[future] = self.waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.waiters[future] -= 1
+            if not self.waiters[future]:
+                del self.waiters[future]
+                if not future.done():
+                    future.cancel()
+
+    def _forget(self, key: str, future: asyncio.Future):
+        # A newer call for the key may already have taken its place
+        if self.calls.get(key) is future:
+            del self.calls[key]
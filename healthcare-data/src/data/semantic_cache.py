@@ -0,0 +1,138 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.sql import text
+
+from ..utils.metrics import cache_event
+from .ann_index import column_type
+from .vector_store import SearchHit, vector_literal
+
+
+class SemanticResultCache:
+    """Reuse the ranked results of a recent, nearly identical query
+
+    Looks up the nearest query_history embedding recorded within max_age
+    seconds among queries that returned at least limit results. If it is
+    within max_distance (cosine distance) of the new query, that query's
+    search_results are returned in rank order instead of scanning
+    medication_cache. An entry is invalid once any medication it
+    references has been updated after the query was recorded, or has been
+    deleted. Both history tables are partitioned by day, so the lookup
+    only reads the partitions within max_age; the lookup is ordered by
+    distance alone so the optional cosine HNSW index on query_history
+    (HISTORY_EMBEDDING_INDEX) can serve it.
+    """
+
+    def __init__(
+        self,
+        engine,
+        max_distance: float = 0.05,
+        max_age: float = 86400,
+        query_table: str = "health.query_history",
+        result_table: str = "health.search_results",
+        medication_table: str = "health.medication_cache",
+    ):
+        self.engine = engine
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.query_table = query_table
+        self.result_table = result_table
+        self.medication_table = medication_table
+        self.statement = None
+
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def _statement(self, conn):
+        # query_history.embedding may have been migrated to halfvec
+        if self.statement is not None:
+            return self.statement
+        embedding_type = column_type(conn, self.query_table) or "vector"
+        self.statement = text(f"""
+            WITH nearest AS (
+                SELECT
+                    q.id,
+                    q.created_at,
+                    q.results_count,
+                    q.embedding <=> CAST(:embedding AS {embedding_type}) AS distance
+                FROM {self.query_table} q
+                WHERE q.created_at >= :since AND q.results_count >= :limit
+                ORDER BY q.embedding <=> CAST(:embedding AS {embedding_type})
+                LIMIT 1
+            )
+            SELECT
+                n.distance,
+                n.created_at,
+                n.results_count,
+                r.medication_id,
+                m.summary,
+                r.similarity_score,
+                m.updated_at
+            FROM nearest n
+            JOIN {self.result_table} r
+                ON r.query_id = n.id AND r.created_at = n.created_at
+            LEFT JOIN {self.medication_table} m ON m.id = r.medication_id
+            WHERE n.distance <= :max_distance
+            ORDER BY r.rank
+        """)
+        return self.statement
+
+    def get(self, embedding: List[float], limit: int) -> Optional[List[SearchHit]]:
+        """Return cached (medication_id, summary, similarity) hits, or None"""
+        since = datetime.now() - timedelta(seconds=self.max_age)
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                self._statement(conn),
+                {
+                    "embedding": vector_literal(embedding),
+                    "since": since,
+                    "limit": max(limit, 1),
+                    "max_distance": self.max_distance,
+                },
+            ).fetchall()
+
+        if not rows:
+            self._count("miss")
+            return None
+
+        # Every referenced medication must still exist, unchanged since the
+        # query ran, or the cached ranking may no longer be right
+        _, created_at, results_count, *_ = rows[0]
+        stale = len(rows) != results_count or any(
+            summary is None or updated_at > created_at
+            for _, _, _, _, summary, _, updated_at in rows
+        )
+        if stale:
+            self._count("invalidated")
+            return None
+
+        self._count("hit")
+        return [
+            (medication_id, summary, similarity)
+            for _, _, _, medication_id, summary, similarity, _ in rows[:limit]
+        ]
+
+    def _count(self, result: str):
+        with self.lock:
+            if result == "hit":
+                self.hits += 1
+            elif result == "invalidated":
+                self.invalidated += 1
+            else:
+                self.misses += 1
+        cache_event("semantic", result)
+
+    def stats(self) -> Dict:
+        """Return hit, miss and invalidation counters for threshold tuning"""
+        with self.lock:
+            lookups = self.hits + self.misses + self.invalidated
+            return {
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidated": self.invalidated,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
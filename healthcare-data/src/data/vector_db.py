@@ -1,28 +1,68 @@
+import logging
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
+import numpy as np
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 from sqlalchemy import (
     UUID,
     Column,
+    Date,
     DateTime,
     Float,
+    ForeignKey,
     Index,
     Integer,
     String,
     UniqueConstraint,
     create_engine,
+    literal_column,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import JSONB, insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import text
 from sqlalchemy.types import UserDefinedType
 
+from ..utils.metrics import cache_event, count, timed
+from .analytics_writer import AnalyticsWriter
+from .embedding_cache import EmbeddingCache
+from .embedding_model import EMBEDDING_DIM, load_model, model_id
 from .fda_client import FDAClient
+from .history_store import create_history_store, ensure_partitions
+from .medication_details import create_details_store, load_details, medication_summary
+from .interaction_store import InteractionStore, create_interaction_store
+from .name_lookup import (
+    NameLookup,
+    create_lexical_indexes,
+    fuse_scores,
+    looks_like_name,
+    merge_name_hits,
+)
+from .semantic_cache import SemanticResultCache
+from .vector_store import (
+    InMemoryVectorStore,
+    SearchHit,
+    VectorStore,
+    create_change_log,
+    create_vector_store,
+)
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+SIMILARITY_THRESHOLD = 0.3  # Lower threshold for better matches
+
+# Bump whenever the models or the DDL in setup_vector_extensions change so
+# existing databases are brought up to date on their next start
+SCHEMA_VERSION = 6
+
+logger = logging.getLogger(__name__)
 
 
 class VECTOR(UserDefinedType):
@@ -44,9 +84,7 @@ class MedicationCache(Base):
     __tablename__ = "medication_cache"
     __table_args__ = (
         UniqueConstraint("brand_name", "generic_name"),
-        Index(
-            "idx_medication_cache_embedding", "embedding", postgresql_using="ivfflat"
-        ),
+        # The embedding index is sized to the data by ann_index.ensure_index
         {"schema": "health"},
     )
 
@@ -54,31 +92,56 @@ class MedicationCache(Base):
     brand_name = Column(String, nullable=False)
     generic_name = Column(String, nullable=False)
     indications = Column(String)
-    embedding = Column(VECTOR(384))
+    embedding = Column(VECTOR(EMBEDDING_DIM))
+    # Search projection; the full label lives in medication_details
+    summary = Column(JSONB)
+    drug_interactions = Column(JSONB)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class MedicationDetails(Base):
+    __tablename__ = "medication_details"
+    __table_args__ = {"schema": "health"}
+
+    medication_id = Column(
+        UUID,
+        ForeignKey("health.medication_cache.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
     raw_data = Column(JSONB)
-    created_at = Column(DateTime, default=datetime.now())
-    updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now())
+    updated_at = Column(DateTime, default=datetime.now)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    __table_args__ = {"schema": "health"}
+
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.now)
 
 
 class QueryHistory(Base):
     __tablename__ = "query_history"
-    __table_args__ = (
-        Index("idx_query_history_embedding", "embedding", postgresql_using="ivfflat"),
-        {"schema": "health"},
-    )
+    # Daily partitions and the optional embedding index are managed by
+    # history_store
+    __table_args__ = {
+        "schema": "health",
+        "postgresql_partition_by": "RANGE (created_at)",
+    }
 
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     query_text = Column(String, nullable=False)
-    embedding = Column(VECTOR(384))
+    embedding = Column(VECTOR(EMBEDDING_DIM))
     results_count = Column(Integer)
-    created_at = Column(DateTime, default=datetime.now())
+    created_at = Column(DateTime, primary_key=True, default=datetime.now)
 
 
 class SearchResult(Base):
     __tablename__ = "search_results"
     __table_args__ = (
         Index("idx_search_results_query", "query_id"),
-        {"schema": "health"},
+        {"schema": "health", "postgresql_partition_by": "RANGE (created_at)"},
     )
 
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
@@ -86,27 +149,302 @@ class SearchResult(Base):
     medication_id = Column(UUID, nullable=False)
     similarity_score = Column(Float)
     rank = Column(Integer)
-    created_at = Column(DateTime, default=datetime.now())
+    # Matches the created_at of its query_history row
+    created_at = Column(DateTime, primary_key=True, default=datetime.now)
+
+
+class QueryDailyStats(Base):
+    __tablename__ = "query_daily_stats"
+    __table_args__ = {"schema": "health"}
+
+    day = Column(Date, primary_key=True)
+    queries = Column(Integer, nullable=False)
+    queries_with_results = Column(Integer, nullable=False)
+    results = Column(Integer, nullable=False)
+    distinct_queries = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now)
+
+
+class MedicationDailyStats(Base):
+    __tablename__ = "medication_daily_stats"
+    __table_args__ = {"schema": "health"}
+
+    day = Column(Date, primary_key=True)
+    medication_id = Column(UUID, primary_key=True)
+    appearances = Column(Integer, nullable=False)
+    top_hits = Column(Integer, nullable=False)
+    avg_similarity = Column(Float)
+
+
+def get_database_url() -> str:
+    """Build the PostgreSQL URL from environment variables"""
+    return f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+
+
+def current_schema_version(conn) -> Optional[int]:
+    """Return the schema version recorded in the database, if any"""
+    exists = conn.execute(text("SELECT to_regclass('health.schema_version')"))
+    if exists.scalar() is None:
+        return None
+    return conn.execute(text("SELECT max(version) FROM health.schema_version")).scalar()
+
+
+def stamp_schema_version(conn):
+    """Record that the database matches SCHEMA_VERSION"""
+    conn.execute(
+        text(
+            "INSERT INTO health.schema_version (version, applied_at) "
+            "VALUES (:version, now()) ON CONFLICT (version) DO NOTHING"
+        ),
+        {"version": SCHEMA_VERSION},
+    )
+
+
+def create_tables(engine, days_ahead: Optional[int] = None):
+    """Create the tables, indexes and partitions, then stamp SCHEMA_VERSION
+
+    Shared by setup_vector_extensions and src/scripts/setup.py, so the
+    version is only recorded once every part of the schema exists.
+    """
+    if days_ahead is None:
+        days_ahead = int(os.getenv("HISTORY_PARTITION_DAYS_AHEAD", "7"))
+    Base.metadata.schema = "health"
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        create_details_store(conn, os.getenv("DETAILS_COMPRESSION") or None)
+        create_lexical_indexes(conn)
+        create_interaction_store(conn)
+        create_change_log(conn, MedicationCache.__table__.fullname)
+        create_history_store(
+            conn,
+            QueryHistory.__table__,
+            SearchResult.__table__,
+            os.getenv("HISTORY_EMBEDDING_INDEX", "none"),
+            days_ahead,
+        )
+        stamp_schema_version(conn)
+
+
+def dedupe_medications(medications: List[Dict]) -> Tuple[List[Dict], int]:
+    """Drop unnamed and repeated (brand_name, generic_name) medications
+
+    Returns the remaining medications and how many were dropped, since a
+    single ON CONFLICT statement cannot touch the same row twice.
+    """
+    unique = {}
+    skipped = 0
+    for med in medications:
+        key = (med.get("brand_name"), med.get("generic_name"))
+        if not key[0] or not key[1] or key in unique:
+            skipped += 1
+            continue
+        unique[key] = med
+    return list(unique.values()), skipped
+
+
+def upsert_medications(
+    conn, medications: List[Dict], embeddings: List[List[float]], batch_size: int = 500
+) -> Dict:
+    """Upsert medications with one INSERT ... ON CONFLICT per batch
+
+    Writes the search row to medication_cache and the full label to
+    medication_details. Runs on the caller's connection so the caller
+    controls the transaction. Returns counts of inserted and updated rows.
+    """
+    counts = {"inserted": 0, "updated": 0}
+    now = datetime.now()
+    table = MedicationCache.__table__
+    details_table = MedicationDetails.__table__
+
+    for start in range(0, len(medications), batch_size):
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "brand_name": med["brand_name"],
+                "generic_name": med["generic_name"],
+                "indications": med.get("indications"),
+                "embedding": embedding,
+                "summary": medication_summary(med),
+                "drug_interactions": med.get("drug_interactions"),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for med, embedding in zip(
+                medications[start : start + batch_size],
+                embeddings[start : start + batch_size],
+            )
+        ]
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["brand_name", "generic_name"],
+            set_={
+                "indications": stmt.excluded.indications,
+                "embedding": stmt.excluded.embedding,
+                "summary": stmt.excluded.summary,
+                "drug_interactions": stmt.excluded.drug_interactions,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(
+            table.c.id,
+            table.c.brand_name,
+            table.c.generic_name,
+            literal_column("xmax = 0").label("inserted"),
+        )
+
+        # Existing rows keep their id, so match labels to ids by name
+        labels = {
+            (med["brand_name"], med["generic_name"]): med
+            for med in medications[start : start + batch_size]
+        }
+        details = []
+        for med_id, brand_name, generic_name, inserted in conn.execute(stmt):
+            counts["inserted" if inserted else "updated"] += 1
+            details.append(
+                {
+                    "medication_id": med_id,
+                    "raw_data": labels[(brand_name, generic_name)],
+                    "updated_at": now,
+                }
+            )
+
+        details_stmt = insert(details_table).values(details)
+        conn.execute(
+            details_stmt.on_conflict_do_update(
+                index_elements=["medication_id"],
+                set_={
+                    "raw_data": details_stmt.excluded.raw_data,
+                    "updated_at": details_stmt.excluded.updated_at,
+                },
+            )
+        )
+
+    return counts
+
+
+def medication_text(medication: Dict) -> str:
+    """Text used to embed a medication"""
+    return f"{medication['brand_name']} {medication['generic_name']} {medication['indications']}"
 
 
 class HealthcareVectorDB:
-    def __init__(self):
+    def __init__(
+        self,
+        model: Optional["SentenceTransformer"] = None,
+        engine: Optional[Engine] = None,
+        fda_client: Optional[FDAClient] = None,
+        vector_store: Optional[VectorStore] = None,
+    ):
         load_dotenv()
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.fda_client = FDAClient()
+        # Reuse shared resources when given so callers don't pay model load
+        # and engine creation more than once per process. Without a model,
+        # one is loaded on first use (or by warm_up)
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.fda_client = fda_client or FDAClient()
+        with timed("startup_embedding_cache"):
+            self.embedding_cache = EmbeddingCache(
+                model_id(),
+                EMBEDDING_DIM,
+                memory_size=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000")),
+                cache_dir=os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings"),
+                disk_size=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000")),
+            )
 
         # Setup database connection
-        self.db_url = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-        self.engine = create_engine(self.db_url)
+        self.db_url = get_database_url()
+        self.engine = engine or create_engine(self.db_url, pool_pre_ping=True)
         self.Session = sessionmaker(bind=self.engine)
 
-        # Initialize database on startup
-        self.setup_vector_extensions()
+        # Initialize database on startup; a no-op once the schema is current
+        self.partition_days_ahead = int(os.getenv("HISTORY_PARTITION_DAYS_AHEAD", "7"))
+        with timed("startup_schema"):
+            self.setup_vector_extensions()
+            self.ensure_history_partitions()
 
-    def setup_vector_extensions(self):
-        """Set up PostgreSQL vector extensions and create tables"""
+        # Search backend: pgvector by default, or an in-process index
+        with timed("startup_vector_store"):
+            self.vector_store = vector_store or create_vector_store(
+                EMBEDDING_DIM, self.engine
+            )
+
+        # Reuse recent near-identical queries' results; off unless set
+        max_distance = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0"))
+        self.semantic_cache = (
+            SemanticResultCache(
+                self.engine,
+                max_distance=max_distance,
+                max_age=float(os.getenv("SEMANTIC_CACHE_MAX_AGE", "86400")),
+            )
+            if max_distance > 0
+            else None
+        )
+
+        # Exact drug names are answered from trigram indexes, skipping the
+        # embedding and ANN search, and near names are merged into vector
+        # results; a lexical weight above 0 also blends full-text rank into
+        # vector results
+        self.name_lookup = (
+            NameLookup(
+                self.engine,
+                min_similarity=float(os.getenv("NAME_LOOKUP_MIN_SIMILARITY", "0.5")),
+            )
+            if os.getenv("NAME_LOOKUP_ENABLED", "true").lower() == "true"
+            else None
+        )
+        self.name_max_words = int(os.getenv("NAME_LOOKUP_MAX_WORDS", "3"))
+        self.name_exact_similarity = float(
+            os.getenv("NAME_LOOKUP_EXACT_SIMILARITY", "1.0")
+        )
+        self.name_weight = float(os.getenv("NAME_LOOKUP_WEIGHT", "0.3"))
+        self.lexical_weight = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0"))
+
+        # Below this many cached medications, query pipelines ask OpenFDA
+        # in parallel with a cache lookup still running after the delay;
+        # 0 disables speculation
+        self.sparse_rows = int(os.getenv("SPECULATIVE_FDA_MAX_ROWS", "100"))
+        self.speculation_delay = (
+            float(os.getenv("SPECULATIVE_FDA_DELAY_MS", "50")) / 1000
+        )
+        self._row_count: Optional[Tuple[float, int]] = None
+
+        # Interaction text stored with cached labels, looked up per regimen
+        self.interactions = InteractionStore(self.engine)
+
+        # Batched background writes for query history and search results
+        self.analytics = AnalyticsWriter(
+            self.engine,
+            QueryHistory.__table__,
+            SearchResult.__table__,
+            max_queue=int(os.getenv("ANALYTICS_QUEUE_SIZE", "10000")),
+            batch_size=int(os.getenv("ANALYTICS_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "1.0")),
+            overflow=os.getenv("ANALYTICS_OVERFLOW", "drop"),
+        )
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_model()
+        return self._model
+
+    def warm_up(self):
+        """Load the embedding model now rather than on the first query"""
+        return self.model
+
+    def setup_vector_extensions(self, force: bool = False) -> bool:
+        """Set up PostgreSQL vector extensions and create tables
+
+        Skipped when the database already records SCHEMA_VERSION, unless
+        force is set. Returns whether the DDL ran.
+        """
         try:
             with self.engine.connect() as conn:
+                if not force and current_schema_version(conn) == SCHEMA_VERSION:
+                    return False
+
                 # Create extensions
                 conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
                 conn.execute(text("CREATE EXTENSION IF NOT EXISTS pgcrypto;"))
@@ -132,26 +470,128 @@ class HealthcareVectorDB:
                 conn.commit()
 
             # Create tables using SQLAlchemy ORM
-            Base.metadata.schema = "health"
-            Base.metadata.create_all(self.engine)
+            create_tables(self.engine, self.partition_days_ahead)
+            return True
 
         except Exception as e:
-            print(f"Error setting up vector database: {str(e)}")
+            logger.error("Error setting up vector database: %s", e)
             raise
 
+    def ensure_history_partitions(self):
+        """Create the coming days' query_history and search_results partitions
+
+        On failure analytics still land in the default partitions, which
+        src/scripts/maintain_history.py sorts into daily ones later.
+        """
+        try:
+            with self.engine.begin() as conn:
+                for table in (QueryHistory.__table__, SearchResult.__table__):
+                    ensure_partitions(conn, table.fullname, self.partition_days_ahead)
+        except Exception as e:
+            logger.error("Error creating query history partitions: %s", e)
+
+    def close(self):
+        """Flush pending writes and caches, then release pooled connections"""
+        self.analytics.close()
+        self.embedding_cache.flush()
+        self.vector_store.close()
+        self.engine.dispose()
+
+    def cache_stats(self) -> Dict:
+        """Return embedding and semantic result cache counters"""
+        stats = {"embedding": self.embedding_cache.stats()}
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        return stats
+
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for text using sentence transformer"""
-        embedding = self.model.encode(text)
+        embedding = self.embedding_cache.get(text)
+        if embedding is None:
+            with timed("embedding"):
+                embedding = self.model.encode(text)
+            self.embedding_cache.put(text, embedding)
         return embedding.tolist()
 
+    def is_sparse(self) -> bool:
+        """Whether the cache is small enough that misses are likely
+
+        The row count is re-read at most once a minute.
+        """
+        if self.sparse_rows <= 0:
+            return False
+        now = time.monotonic()
+        if self._row_count is None or now - self._row_count[0] > 60:
+            self._row_count = (now, len(self.vector_store))
+        return self._row_count[1] < self.sparse_rows
+
+    def rank_medications(
+        self, query_text: str, medications: List[Dict], limit: int = 5
+    ) -> List[Tuple[Dict, float]]:
+        """Rank medications that are not cached yet against the query
+
+        Scores them like find_similar_medications would once they are
+        cached, without the round trip. Their embeddings land in the
+        embedding cache, so caching them afterwards does not re-encode.
+        """
+        if not medications:
+            return []
+        query = np.asarray(self.generate_embedding(query_text), dtype=np.float32)
+        vectors = np.asarray(
+            self.generate_embeddings([medication_text(med) for med in medications]),
+            dtype=np.float32,
+        )
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = vectors @ query / np.where(norms == 0, 1.0, norms)
+        ranked = sorted(zip(medications, scores.tolist()), key=lambda hit: -hit[1])
+        return [(med, sim) for med, sim in ranked if sim > SIMILARITY_THRESHOLD][:limit]
+
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for many texts with a single batched encode"""
+        embeddings = [self.embedding_cache.get(t) for t in texts]
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        if missing:
+            with timed("embedding"):
+                encoded = self.model.encode([texts[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                self.embedding_cache.put(texts[i], embedding)
+                embeddings[i] = embedding
+        return [e.tolist() for e in embeddings]
+
+    def cache_medications(self, medications: List[Dict], batch_size: int = 500) -> Dict:
+        """Bulk upsert medications and their embeddings in one transaction
+
+        Returns counts of inserted, updated and skipped medications. Rows
+        missing a name, or repeating a (brand_name, generic_name) pair
+        already seen in the input, are skipped.
+        """
+        total = len(medications)
+        medications, skipped = dedupe_medications(medications)
+        if not medications:
+            return {"inserted": 0, "updated": 0, "skipped": skipped}
+
+        try:
+            embeddings = self.generate_embeddings(
+                [medication_text(med) for med in medications]
+            )
+            with timed("db_write"), self.engine.begin() as conn:
+                counts = upsert_medications(conn, medications, embeddings, batch_size)
+            counts["skipped"] = skipped
+            self.vector_store.refresh()
+            return counts
+
+        except Exception as e:
+            logger.error("Error caching medications: %s", e)
+            # The transaction was rolled back, so nothing was written
+            return {"inserted": 0, "updated": 0, "skipped": total}
+
     def cache_medication(self, medication: Dict) -> Optional[MedicationCache]:
         """Store medication data and its embedding in the cache"""
         try:
             session = self.Session()
 
             # Generate embedding
-            text_to_embed = f"{medication['brand_name']} {medication['generic_name']} {medication['indications']}"
-            embedding = self.generate_embedding(text_to_embed)
+            embedding = self.generate_embedding(medication_text(medication))
 
             # Check if medication already exists
             existing = (
@@ -167,7 +607,8 @@ class HealthcareVectorDB:
                 # Update existing record
                 existing.indications = medication["indications"]
                 existing.embedding = embedding
-                existing.raw_data = medication
+                existing.summary = medication_summary(medication)
+                existing.drug_interactions = medication.get("drug_interactions")
                 existing.updated_at = datetime.now()
                 cache_entry = existing
             else:
@@ -178,92 +619,196 @@ class HealthcareVectorDB:
                     generic_name=medication["generic_name"],
                     indications=medication["indications"],
                     embedding=embedding,
-                    raw_data=medication,
+                    summary=medication_summary(medication),
+                    drug_interactions=medication.get("drug_interactions"),
                 )
                 session.add(cache_entry)
 
-            session.commit()
+            session.merge(
+                MedicationDetails(
+                    medication_id=cache_entry.id,
+                    raw_data=medication,
+                    updated_at=datetime.now(),
+                )
+            )
+            with timed("db_write"):
+                session.commit()
+            self.vector_store.refresh()
             return cache_entry
 
         except Exception as e:
-            print(f"Error caching medication: {str(e)}")
+            logger.error("Error caching medication: %s", e)
             session.rollback()
             return None
         finally:
             session.close()
 
-    def find_similar_medications(
+    def find_by_name(
         self, query_text: str, limit: int = 5
-    ) -> List[Tuple[Dict, float]]:
-        """Find similar medications using vector similarity"""
+    ) -> Tuple[List[Tuple[Dict, Optional[float]]], List[SearchHit]]:
+        """Match the query against brand and generic names
+
+        Returns the results for an exact name, whose trigram score reaches
+        NAME_LOOKUP_EXACT_SIMILARITY (1.0 by default), and the near name
+        matches otherwise, for find_similar_medications to merge into
+        vector results. Name results have no vector similarity (None) and
+        carry the trigram score as "name_score". Both are empty unless the
+        query looks like a drug name and name lookup is enabled.
+        """
+        if self.name_lookup is None or not looks_like_name(
+            query_text, self.name_max_words
+        ):
+            return [], []
         try:
-            session = self.Session()
+            with timed("name_lookup"):
+                hits = self.name_lookup.search(query_text, limit)
+        except Exception as e:
+            logger.error("Error looking up medication names: %s", e)
+            return [], []
+
+        exact = [hit for hit in hits if hit[2] >= self.name_exact_similarity]
+        if not exact:
+            count("query_routes_total", route="name_near" if hits else "name_miss")
+            return [], hits
+
+        count("query_routes_total", route="name")
+        self.analytics.record(
+            query_text, None, [(med_id, None) for med_id, _, _ in exact]
+        )
+        return [
+            ({**med, "id": str(med_id), "name_score": score}, None)
+            for med_id, med, score in exact
+        ], []
+
+    def get_medication_details(self, medication_ids: List[str]) -> Dict[str, Dict]:
+        """Full label JSON for search results, keyed by medication id"""
+        with timed("details_read"), self.engine.connect() as conn:
+            return load_details(conn, medication_ids)
+
+    def cached_interactions(self, drug_name: str) -> Optional[List[str]]:
+        """Interaction text stored with a cached medication of this name
+
+        Returns None when no cached label matches; callers fall back to
+        OpenFDA.
+        """
+        return self.check_interactions([drug_name])["interactions"].get(drug_name)
+
+    def check_interactions(self, drug_names: List[str]) -> Dict:
+        """Cached interactions for a regimen, in one database round trip
+
+        See InteractionStore.lookup; on a database error every drug is
+        reported as missing.
+        """
+        try:
+            with timed("interaction_lookup"):
+                result = self.interactions.lookup(drug_names)
+        except Exception as e:
+            logger.error("Error looking up drug interactions: %s", e)
+            return {"interactions": {}, "aliases": {}, "missing": list(drug_names)}
+        cache_event("interactions", "hit" if not result["missing"] else "miss")
+        return result
 
-            # Generate query embedding
-            query_embedding = self.generate_embedding(query_text)
-            embedding_str = f"[{','.join(map(str, query_embedding))}]"
+    def find_similar_medications(
+        self,
+        query_text: str,
+        limit: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        route_names: bool = True,
+        name_hits: Optional[List[SearchHit]] = None,
+    ) -> List[Tuple[Dict, Optional[float]]]:
+        """Find similar medications, trying a name match before vectors
+
+        Pass query_embedding when the caller has already embedded the query,
+        e.g. as part of a batch, and route_names=False when it has already
+        tried find_by_name, with the near matches it returned as name_hits.
+        """
+        if route_names:
+            by_name, name_hits = self.find_by_name(query_text, limit)
+            if by_name:
+                return by_name
 
-            # Store query history
-            query_record = QueryHistory(
-                query_text=query_text, embedding=query_embedding
-            )
-            session.add(query_record)
-            session.flush()
-
-            # Check if we have any medications in cache
-            count = session.query(MedicationCache).count()
-            print(f"Found {count} medications in cache")
-
-            # Use raw SQL with direct embedding string and lower threshold
-            similar_meds = session.execute(
-                text(f"""
-                    WITH similarity_scores AS (
-                        SELECT 
-                            m.id as medication_id,
-                            m.raw_data,
-                            (1 - (m.embedding <=> '{embedding_str}'::vector)) as similarity
-                        FROM health.medication_cache m
-                        ORDER BY similarity DESC
-                        LIMIT :limit
+        try:
+            if query_embedding is None:
+                query_embedding = self.generate_embedding(query_text)
+
+            similar_meds = None
+            # In-process stores answer faster than the cache's round trip
+            if self.semantic_cache is not None and not isinstance(
+                self.vector_store, InMemoryVectorStore
+            ):
+                with timed("semantic_cache"):
+                    similar_meds = self.semantic_cache.get(query_embedding, limit)
+            if similar_meds is None:
+                with timed("db_read"):
+                    similar_meds = self.vector_store.search(
+                        query_embedding, limit, SIMILARITY_THRESHOLD
                     )
-                    SELECT medication_id, raw_data, similarity, 
-                           (SELECT COUNT(*) FROM health.medication_cache) as total_meds
-                    FROM similarity_scores
-                    WHERE similarity > :threshold;
-                """),
-                {
-                    "threshold": 0.3,  # Lower threshold for better matches
-                    "limit": limit,
-                },
-            ).fetchall()
-
-            # Print detailed debug info
-            if similar_meds:
-                print("\nSimilarity scores:")
-                for _, med, score, _ in similar_meds:
-                    print(f"- {med['brand_name']}: {score:.3f}")
-            else:
-                print("No medications above similarity threshold")
-
-            # Record search results
-            for rank, (med_id, med_data, similarity, _) in enumerate(similar_meds, 1):
-                result = SearchResult(
-                    query_id=query_record.id,
-                    medication_id=med_id,  # Use the actual medication_id from the database
-                    similarity_score=similarity,
-                    rank=rank,
+                if self.lexical_weight > 0 and self.name_lookup is not None:
+                    with timed("lexical_search"):
+                        lexical = self.name_lookup.search_text(query_text, limit)
+                    similar_meds = fuse_scores(
+                        similar_meds, lexical, self.lexical_weight, limit
+                    )
+            if name_hits:
+                similar_meds = merge_name_hits(
+                    similar_meds, name_hits, self.name_weight, limit
+                )
+            count("query_routes_total", route="vector")
+
+            if logger.isEnabledFor(logging.DEBUG):
+                # Medications only found by name have no vector similarity
+                scores = ", ".join(
+                    f"{med['brand_name']}="
+                    + ("name" if score is None else f"{score:.3f}")
+                    for _, med, score in similar_meds
+                )
+                logger.debug(
+                    "Similarity scores for %r: %s", query_text, scores or "none"
                 )
-                session.add(result)
 
-            query_record.results_count = len(similar_meds)
-            session.commit()
+            # Record query history and search results off the request path
+            self.analytics.record(
+                query_text,
+                query_embedding,
+                [(med_id, similarity) for med_id, _, similarity in similar_meds],
+            )
 
-            # Return just the medication and similarity score
-            return [(med, sim) for _, med, sim, _ in similar_meds]
+            # Return the medication summary (with its id, for details) and score
+            return [
+                ({**med, "id": str(med_id)}, sim) for med_id, med, sim in similar_meds
+            ]
 
         except Exception as e:
-            print(f"Error finding similar medications: {str(e)}")
-            session.rollback()
+            logger.error("Error finding similar medications: %s", e)
             return []
-        finally:
-            session.close()
+
+    def find_similar_medications_batch(
+        self, queries: List[str], limit: int = 5, batch_size: int = 1000
+    ) -> List[List[Tuple[Dict, float]]]:
+        """Find similar medications for many queries, in input order
+
+        For offline scoring: each batch_size chunk of queries is embedded
+        with one encode call and searched in one vector store call (a
+        single SQL statement on pgvector). Only vector search is used, so
+        results match find_similar_medications with route_names=False, the
+        semantic cache off and no lexical blending. Queries are not
+        recorded in the query history.
+        """
+        results = []
+        for start in range(0, len(queries), batch_size):
+            chunk = queries[start : start + batch_size]
+            try:
+                embeddings = self.generate_embeddings(chunk)
+                with timed("db_read"):
+                    hits = self.vector_store.search_batch(
+                        embeddings, limit, SIMILARITY_THRESHOLD
+                    )
+                count("query_routes_total", len(chunk), route="vector_batch")
+            except Exception as e:
+                logger.error("Error finding similar medications in batch: %s", e)
+                hits = [[] for _ in chunk]
+            results.extend(
+                [({**med, "id": str(med_id)}, sim) for med_id, med, sim in query_hits]
+                for query_hits in hits
+            )
+        return results
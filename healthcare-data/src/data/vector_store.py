@@ -0,0 +1,663 @@
+import contextlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.sql import text
+
+from .ann_index import STORAGE, current_index, session_settings
+
+logger = logging.getLogger(__name__)
+
+# (medication_id, summary, similarity)
+SearchHit = Tuple[str, Dict, float]
+
+
+class VectorStore:
+    """Interface for medication embedding search backends"""
+
+    def search(
+        self, embedding: List[float], limit: int, threshold: float
+    ) -> List[SearchHit]:
+        """Return the top medications with similarity above threshold"""
+        raise NotImplementedError
+
+    def search_batch(
+        self, embeddings: List[List[float]], limit: int, threshold: float
+    ) -> List[List[SearchHit]]:
+        """Search for many embeddings, returning hits in input order"""
+        return [self.search(embedding, limit, threshold) for embedding in embeddings]
+
+    def refresh(self):
+        """Pull medication_cache changes into the store, if it keeps a copy"""
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the store"""
+
+
+def vector_array_literal(embeddings) -> str:
+    """Format embeddings as a PostgreSQL array literal of vectors"""
+    return "{" + ",".join(f'"{vector_literal(e)}"' for e in embeddings) + "}"
+
+
+def vector_literal(embedding) -> str:
+    """Format an embedding as a compact pgvector text literal
+
+    Nine significant digits round-trip any float32, so this is lossless
+    for the vector column while still far shorter than repr() of a double.
+    """
+    return "[" + ",".join(f"{float(x):.9g}" for x in embedding) + "]"
+
+
+class PgVectorStore(VectorStore):
+    """Search medication_cache in PostgreSQL with pgvector
+
+    The query runs as a server-side prepared statement taking the vector as
+    a bound parameter, so it is planned once per connection rather than
+    reparsed per search. Ordering on the raw distance lets the planner use
+    the ivfflat/HNSW index.
+
+    With halfvec or bit storage the index covers a compact cast of the
+    embedding. The first stage fetches rerank_factor times the requested
+    rows through that index, and the full-precision embeddings re-rank them.
+
+    search_batch sends many vectors as one array and runs the same search
+    for each in a LATERAL join, so a batch costs one round trip.
+    """
+
+    def __init__(
+        self,
+        engine,
+        table: str = "health.medication_cache",
+        session_settings: Optional[Dict[str, int]] = None,
+        storage: str = "vector",
+        rerank_factor: int = 4,
+    ):
+        if storage not in STORAGE:
+            raise ValueError(f"Unknown index storage: {storage}")
+        self.engine = engine
+        self.table = table
+        self.session_settings = session_settings or {}
+        self.storage = storage
+        self.rerank_factor = rerank_factor
+        self.statement_name = "vector_search_" + re.sub(r"\W", "_", table)
+        self.statement_name += f"_{storage}"
+        self.batch_statement = None
+
+    def _candidates(self, query: str, limit: str) -> str:
+        """Rows the exact ordering runs over, given SQL for the query vector"""
+        if self.storage == "vector":
+            return self.table
+        # Must match the indexed expression for the planner to use it
+        expression, _, operator, cast = STORAGE[self.storage]
+        return f"""(
+                SELECT id, summary, embedding
+                FROM {self.table}
+                ORDER BY {expression} {operator} {cast.replace("$1", query)}
+                LIMIT {limit}
+            )"""
+
+    def _prepare(self, conn):
+        # Prepared statements and settings live as long as the DBAPI connection
+        info = conn.connection.info
+        if info.get(self.statement_name):
+            return
+        for name, value in self.session_settings.items():
+            conn.exec_driver_sql(f"SET {name} = {int(value)}")
+        candidates = self._candidates("$1", "$4")
+        conn.exec_driver_sql(f"""
+            PREPARE {self.statement_name} (vector, integer, float8, integer) AS
+            SELECT medication_id, summary, similarity
+            FROM (
+                SELECT
+                    m.id AS medication_id,
+                    m.summary,
+                    1 - (m.embedding <=> $1) AS similarity
+                FROM {candidates} m
+                ORDER BY m.embedding <=> $1
+                LIMIT $2
+            ) nearest
+            WHERE similarity > $3
+        """)
+        # Commit so the SETs are not undone when the pool resets the connection
+        conn.commit()
+        info[self.statement_name] = True
+
+    def search(
+        self, embedding: List[float], limit: int, threshold: float
+    ) -> List[SearchHit]:
+        with self.engine.connect() as conn:
+            self._prepare(conn)
+            rows = conn.exec_driver_sql(
+                f"EXECUTE {self.statement_name} (%s, %s, %s, %s)",
+                (
+                    vector_literal(embedding),
+                    limit,
+                    threshold,
+                    limit * self.rerank_factor,
+                ),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def search_batch(
+        self, embeddings: List[List[float]], limit: int, threshold: float
+    ) -> List[List[SearchHit]]:
+        if not embeddings:
+            return []
+        if self.batch_statement is None:
+            self.batch_statement = text(f"""
+                SELECT q.ord, nearest.medication_id, nearest.summary, nearest.similarity
+                FROM unnest(CAST(:embeddings AS vector[]))
+                    WITH ORDINALITY AS q(embedding, ord)
+                CROSS JOIN LATERAL (
+                    SELECT
+                        m.id AS medication_id,
+                        m.summary,
+                        1 - (m.embedding <=> q.embedding) AS similarity
+                    FROM {self._candidates("q.embedding", ":candidates")} m
+                    ORDER BY m.embedding <=> q.embedding
+                    LIMIT :limit
+                ) nearest
+                WHERE nearest.similarity > :threshold
+                ORDER BY q.ord, nearest.similarity DESC
+            """)
+        with self.engine.connect() as conn:
+            # Applies the index search settings to this connection
+            self._prepare(conn)
+            rows = conn.execute(
+                self.batch_statement,
+                {
+                    "embeddings": vector_array_literal(embeddings),
+                    "limit": limit,
+                    "threshold": threshold,
+                    "candidates": limit * self.rerank_factor,
+                },
+            ).fetchall()
+
+        results = [[] for _ in embeddings]
+        for position, medication_id, summary, similarity in rows:
+            results[position - 1].append((medication_id, summary, similarity))
+        return results
+
+    def __len__(self) -> int:
+        # Planner estimate kept current by autovacuum, instead of COUNT(*)
+        with self.engine.connect() as conn:
+            count = conn.execute(
+                text(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = CAST(:table AS regclass)"
+                ),
+                {"table": self.table},
+            ).scalar()
+        return max(count or 0, 0)
+
+
+def create_change_log(conn, table: str = "health.medication_cache"):
+    """Record which transaction last wrote each medication, and deletions
+
+    Every row carries the id of the transaction that inserted or last
+    updated it, and deleted ids are kept in medication_deletions. In-memory
+    stores compare these with the snapshot of their previous refresh, so
+    they pick up changes in commit order whichever process made them.
+    """
+    conn.execute(
+        text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS changed_xid xid8 "
+            "NOT NULL DEFAULT pg_current_xact_id()"
+        )
+    )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS idx_medication_cache_changed_xid "
+            f"ON {table} (changed_xid)"
+        )
+    )
+    conn.execute(
+        text("""
+            CREATE TABLE IF NOT EXISTS health.medication_deletions (
+                medication_id uuid NOT NULL,
+                deleted_xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+                deleted_at timestamp NOT NULL DEFAULT now()
+            )
+        """)
+    )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS idx_medication_deletions_xid "
+            "ON health.medication_deletions (deleted_xid)"
+        )
+    )
+    conn.execute(
+        text("""
+            CREATE OR REPLACE FUNCTION health.medication_cache_changed()
+            RETURNS trigger AS $$
+            BEGIN
+                NEW.changed_xid := pg_current_xact_id();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+    )
+    conn.execute(
+        text("""
+            CREATE OR REPLACE FUNCTION health.medication_cache_deleted()
+            RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO health.medication_deletions (medication_id)
+                SELECT id FROM deleted_rows;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+    )
+    conn.execute(text(f"DROP TRIGGER IF EXISTS medication_cache_changed ON {table}"))
+    conn.execute(
+        text(
+            f"CREATE TRIGGER medication_cache_changed BEFORE UPDATE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION health.medication_cache_changed()"
+        )
+    )
+    conn.execute(text(f"DROP TRIGGER IF EXISTS medication_cache_deleted ON {table}"))
+    conn.execute(
+        text(
+            f"CREATE TRIGGER medication_cache_deleted AFTER DELETE ON {table} "
+            "REFERENCING OLD TABLE AS deleted_rows FOR EACH STATEMENT "
+            "EXECUTE FUNCTION health.medication_cache_deleted()"
+        )
+    )
+
+
+class InMemoryVectorStore(VectorStore):
+    """Base for in-process indexes mirroring medication_cache
+
+    Keeps ids and summaries in memory alongside the vectors. When given an
+    engine, refresh() reads the rows and deletions committed since the
+    snapshot of the previous refresh (see create_change_log), so the index
+    follows medication_cache incrementally, including writes by other
+    processes. start_refresher() runs it every few seconds in the
+    background. Without an engine the store is fully local and fed through
+    upsert() and remove().
+
+    Removed medications leave a dead slot behind until the next restart.
+    """
+
+    # Deletions older than this are pruned; a store that has not refreshed
+    # for longer reloads everything instead
+    TOMBSTONE_SECONDS = 86400
+
+    def __init__(self, dim: int, engine=None):
+        self.dim = dim
+        self.engine = engine
+        self.ids: List = []
+        self.payloads: List[Dict] = []
+        self.positions: Dict[str, int] = {}
+        self.dead = 0
+        self.snapshot: Optional[str] = None
+        self.refreshed_at = 0.0
+        self.lock = threading.RLock()
+        self.refresh_lock = threading.Lock()
+        self.stop = threading.Event()
+        self.refresher: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def upsert(self, ids: List[str], embeddings, payloads: List[Dict]):
+        """Add or replace medications by id"""
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self.lock:
+            positions = []
+            for med_id, payload in zip(ids, payloads):
+                position = self.positions.get(str(med_id))
+                if position is None:
+                    position = len(self.ids)
+                    self.positions[str(med_id)] = position
+                    self.ids.append(med_id)
+                    self.payloads.append(payload)
+                else:
+                    self.payloads[position] = payload
+                positions.append(position)
+            self._set_vectors(np.asarray(positions), vectors)
+
+    def remove(self, ids: List[str]):
+        """Drop medications by id; unknown ids are ignored"""
+        with self.lock:
+            for med_id in ids:
+                position = self.positions.pop(str(med_id), None)
+                if position is None:
+                    continue
+                self.ids[position] = None
+                self.payloads[position] = None
+                self.dead += 1
+                self._remove_vector(position)
+
+    def refresh(self, batch_size: int = 10000):
+        if self.engine is None:
+            return
+        with self.refresh_lock:
+            stale = time.monotonic() - self.refreshed_at > self.TOMBSTONE_SECONDS
+            full = self.snapshot is None or stale
+            # Rows written by transactions not yet committed at the last refresh
+            changed = (
+                ""
+                if full
+                else "WHERE changed_xid >= pg_snapshot_xmin(CAST(:snapshot AS "
+                "pg_snapshot)) AND NOT pg_visible_in_snapshot(changed_xid, "
+                "CAST(:snapshot AS pg_snapshot))"
+            )
+            # One snapshot for the rows read and the snapshot recorded
+            with self.engine.connect().execution_options(
+                isolation_level="REPEATABLE READ"
+            ) as conn:
+                snapshot = conn.execute(text("SELECT pg_current_snapshot()::text"))
+                snapshot = snapshot.scalar()
+                result = conn.execute(
+                    text(
+                        "SELECT id, embedding, summary FROM health.medication_cache "
+                        + changed
+                    ),
+                    {"snapshot": self.snapshot},
+                    execution_options={"stream_results": True},
+                )
+                seen = set()
+                while True:
+                    rows = result.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    self.upsert(
+                        [row[0] for row in rows],
+                        [json.loads(row[1]) for row in rows],
+                        [row[2] for row in rows],
+                    )
+                    if full:
+                        seen.update(str(row[0]) for row in rows)
+
+                if full:
+                    with self.lock:
+                        gone = [i for i in self.positions if i not in seen]
+                else:
+                    gone = conn.execute(
+                        text("""
+                            SELECT d.medication_id
+                            FROM health.medication_deletions d
+                            WHERE d.deleted_xid >=
+                                pg_snapshot_xmin(CAST(:snapshot AS pg_snapshot))
+                              AND NOT pg_visible_in_snapshot(
+                                d.deleted_xid, CAST(:snapshot AS pg_snapshot))
+                              AND NOT EXISTS (
+                                SELECT 1 FROM health.medication_cache m
+                                WHERE m.id = d.medication_id)
+                        """),
+                        {"snapshot": self.snapshot},
+                    ).fetchall()
+                    gone = [row[0] for row in gone]
+                self.remove(gone)
+
+                conn.execute(
+                    text(
+                        "DELETE FROM health.medication_deletions "
+                        "WHERE deleted_at < now() - make_interval(secs => :seconds)"
+                    ),
+                    {"seconds": self.TOMBSTONE_SECONDS},
+                )
+                conn.commit()
+            self.snapshot = snapshot
+            self.refreshed_at = time.monotonic()
+
+    def start_refresher(self, interval: float):
+        """Refresh every interval seconds in a background thread"""
+        if self.engine is None or interval <= 0 or self.refresher is not None:
+            return
+
+        def run():
+            while not self.stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error("Error refreshing vector store: %s", e)
+
+        self.refresher = threading.Thread(
+            target=run, name="vector-store-refresh", daemon=True
+        )
+        self.refresher.start()
+
+    def close(self):
+        self.stop.set()
+        if self.refresher is not None:
+            self.refresher.join()
+
+    def _k(self, limit: int) -> int:
+        # Dead slots may take some of the top positions
+        return min(limit + self.dead, len(self.ids))
+
+    def _hits(self, positions, scores, limit: int, threshold: float) -> List[SearchHit]:
+        hits = [
+            (self.ids[position], self.payloads[position], float(score))
+            for position, score in zip(positions, scores)
+            if score > threshold and self.ids[position] is not None
+        ]
+        return hits[:limit]
+
+    def search(
+        self, embedding: List[float], limit: int, threshold: float
+    ) -> List[SearchHit]:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        with self.lock:
+            if not self.positions:
+                return []
+            positions, scores = self._search(query, self._k(limit))
+            return self._hits(positions, scores, limit, threshold)
+
+    def search_batch(
+        self, embeddings: List[List[float]], limit: int, threshold: float
+    ) -> List[List[SearchHit]]:
+        if not len(embeddings):
+            return []
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        with self.lock:
+            if not self.positions:
+                return [[] for _ in range(len(queries))]
+            positions, scores = self._search_batch(queries, self._k(limit))
+            return [
+                self._hits(row_positions, row_scores, limit, threshold)
+                for row_positions, row_scores in zip(positions, scores)
+            ]
+
+    def _set_vectors(self, positions: np.ndarray, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def _remove_vector(self, position: int):
+        """Keep a removed slot out of search results where the index can"""
+
+    def _search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return positions and similarities of the top k, best first"""
+        raise NotImplementedError
+
+    def _search_batch(
+        self, queries: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """_search for each row of queries, as (queries, k) arrays"""
+        results = [self._search(query, k) for query in queries]
+        return (
+            np.asarray([positions for positions, _ in results]),
+            np.asarray([scores for _, scores in results]),
+        )
+
+
+class NumpyVectorStore(InMemoryVectorStore):
+    """Exact search as a matrix product over a float32 array
+
+    When a path is given the array is memory-mapped from a file next to
+    it, so large corpora live in the page cache rather than the Python
+    heap. Each process maps its own <path>.<pid> file, removed on close.
+    """
+
+    def __init__(self, dim: int, engine=None, path: Optional[str] = None):
+        super().__init__(dim, engine)
+        # Truncating a file another worker has mapped would crash it
+        self.path = f"{path}.{os.getpid()}" if path else None
+        self.capacity = 0
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # The file is rebuilt from medication_cache on every start
+            open(self.path, "wb").close()
+
+    def close(self):
+        super().close()
+        if self.path:
+            with self.lock:
+                self.vectors = np.empty((0, self.dim), dtype=np.float32)
+                self.capacity = 0
+            with contextlib.suppress(OSError):
+                os.remove(self.path)
+
+    def _grow(self, needed: int):
+        capacity = max(needed, self.capacity * 2, 1024)
+        if self.path:
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+            with open(self.path, "r+b") as f:
+                f.truncate(capacity * self.dim * 4)
+            self.vectors = np.memmap(
+                self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+        else:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[: self.capacity] = self.vectors[: self.capacity]
+            self.vectors = vectors
+        self.capacity = capacity
+
+    def _set_vectors(self, positions: np.ndarray, vectors: np.ndarray):
+        if len(self.ids) > self.capacity:
+            self._grow(len(self.ids))
+        self.vectors[positions] = vectors
+
+    def _search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.vectors[: len(self.ids)] @ query
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def _search_batch(
+        self, queries: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        count = len(self.ids)
+        # Bound the (queries, rows) score matrix to about 64 MB at a time
+        step = max(1, (1 << 24) // count)
+        positions, similarities = [], []
+        for start in range(0, len(queries), step):
+            scores = queries[start : start + step] @ self.vectors[:count].T
+            if k < count:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(count), scores.shape)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            positions.append(np.take_along_axis(top, order, axis=1))
+            similarities.append(np.take_along_axis(top_scores, order, axis=1))
+        return np.concatenate(positions), np.concatenate(similarities)
+
+
+class HnswVectorStore(InMemoryVectorStore):
+    """Approximate search over an HNSW graph, for larger corpora"""
+
+    def __init__(
+        self,
+        dim: int,
+        engine=None,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+    ):
+        import hnswlib
+
+        super().__init__(dim, engine)
+        self.ef_search = ef_search
+        self.capacity = 1024
+        self.index = hnswlib.Index(space="cosine", dim=dim)
+        self.index.init_index(
+            max_elements=self.capacity, M=m, ef_construction=ef_construction
+        )
+
+    def _set_vectors(self, positions: np.ndarray, vectors: np.ndarray):
+        if len(self.ids) > self.capacity:
+            self.capacity = max(len(self.ids), self.capacity * 2)
+            self.index.resize_index(self.capacity)
+        # Adding an existing label replaces its vector
+        self.index.add_items(vectors, positions)
+
+    def _remove_vector(self, position: int):
+        self.index.mark_deleted(position)
+
+    def _k(self, limit: int) -> int:
+        # Deleted labels are skipped by the graph search itself
+        return min(limit, len(self.positions))
+
+    def _search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(query, k=k)
+        return labels[0], 1 - distances[0]
+
+    def _search_batch(
+        self, queries: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # hnswlib searches the rows of queries in parallel
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(queries, k=k)
+        return labels, 1 - distances
+
+
+def create_vector_store(dim: int, engine, backend: Optional[str] = None) -> VectorStore:
+    """Build the vector store selected by VECTOR_STORE (pgvector, numpy, hnsw)"""
+    backend = (backend or os.getenv("VECTOR_STORE", "pgvector")).lower()
+    if backend == "pgvector":
+        # Tune ivfflat.probes / hnsw.ef_search for the index that exists now
+        recall_target = float(os.getenv("ANN_RECALL_TARGET", "0.95"))
+        with engine.connect() as conn:
+            index = current_index(conn)
+        # Search the way the index stores embeddings, re-ranking compact ones
+        return PgVectorStore(
+            engine,
+            session_settings=session_settings(index, recall_target),
+            storage=(index or {}).get("storage") or "vector",
+            rerank_factor=int(os.getenv("ANN_RERANK_FACTOR", "4")),
+        )
+    if backend == "numpy":
+        store = NumpyVectorStore(dim, engine, path=os.getenv("VECTOR_STORE_PATH"))
+    elif backend == "hnsw":
+        store = HnswVectorStore(
+            dim,
+            engine,
+            m=int(os.getenv("HNSW_M", "16")),
+            ef_construction=int(os.getenv("HNSW_EF_CONSTRUCTION", "200")),
+            ef_search=int(os.getenv("HNSW_EF_SEARCH", "64")),
+        )
+    else:
+        raise ValueError(f"Unknown VECTOR_STORE backend: {backend}")
+    store.refresh()
+    store.start_refresher(float(os.getenv("VECTOR_STORE_REFRESH_INTERVAL", "5")))
+    return store
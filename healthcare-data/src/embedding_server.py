@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import signal
+import socket
+import sys
+from typing import Dict, Optional, Set
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.embedding_batcher import EmbeddingBatcher
+from src.data.embedding_model import (
+    DEFAULT_SERVER_SOCKET,
+    EMBEDDING_DIM,
+    load_model,
+    model_id,
+)
+from src.data.remote_encoder import HEADER, STATUS_ERROR, STATUS_OK
+from src.utils.metrics import count, timed
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class EmbeddingServer:
+    """One process holding the embedding model for every local worker
+
+    Workers connect over a Unix socket with RemoteEncoder. Texts from all
+    connections go through one EmbeddingBatcher, so requests arriving from
+    different workers at the same moment share a model.encode call.
+    """
+
+    def __init__(self, model, path: str, max_batch_size: int, max_wait_ms: float):
+        self.model = model
+        self.path = path
+        self.batcher = EmbeddingBatcher(
+            lambda texts: model.encode(texts, batch_size=len(texts)),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+        self.requests = 0
+        self.texts = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.connections: Set[asyncio.Task] = set()
+
+    def info(self) -> Dict:
+        return {
+            "model_id": model_id(),
+            "dim": EMBEDDING_DIM,
+            "requests": self.requests,
+            "texts": self.texts,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+    async def _respond(self, message: Dict) -> bytes:
+        if message.get("op") == "info":
+            return STATUS_OK + json.dumps(self.info()).encode()
+        texts = message.get("texts")
+        if message.get("op") != "encode" or not isinstance(texts, list):
+            return STATUS_ERROR + b"Unknown request"
+
+        self.requests += 1
+        self.texts += len(texts)
+        count("embedding_server_requests_total")
+        with timed("embedding_server"):
+            embeddings = await asyncio.gather(
+                *(self.batcher.embed(str(text)) for text in texts)
+            )
+        return STATUS_OK + np.asarray(embeddings, dtype=np.float32).tobytes()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                (size,) = HEADER.unpack(header)
+                payload = await reader.readexactly(size)
+                try:
+                    response = await self._respond(json.loads(payload))
+                except Exception as e:
+                    response = STATUS_ERROR + str(e).encode()
+                writer.write(HEADER.pack(len(response)) + response)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    async def serve(self):
+        _remove_stale_socket(self.path)
+        self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+        # Only processes of the same user may connect
+        os.chmod(self.path, 0o600)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        print(f"Embedding server ({model_id()}) listening on {self.path}")
+        async with self.server:
+            await stop.wait()
+            # Let workers see a closed connection rather than a hang
+            for task in list(self.connections):
+                task.cancel()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.batcher.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def _remove_stale_socket(path: str):
+    """Delete a socket file left by a server that is no longer running"""
+    if not os.path.exists(path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise RuntimeError(f"An embedding server is already listening on {path}")
+    finally:
+        probe.close()
+
+
+def main():
+    """Serve embeddings to local worker processes over a Unix socket"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--socket",
+        default=os.getenv("EMBEDDING_SERVER_SOCKET") or DEFAULT_SERVER_SOCKET,
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=int(os.getenv("EMBEDDING_SERVER_BATCH_SIZE", "64")),
+    )
+    parser.add_argument(
+        "--batch-wait-ms",
+        type=float,
+        default=float(os.getenv("EMBEDDING_SERVER_BATCH_WAIT_MS", "2")),
+    )
+    args = parser.parse_args()
+
+    model = load_model(remote=False)
+    model.encode("warm up")
+    server = EmbeddingServer(model, args.socket, args.batch_size, args.batch_wait_ms)
+    try:
+        asyncio.run(server.serve())
+    except RuntimeError as e:
+        print(f"Error starting embedding server: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,49 @@
+import argparse
 import asyncio
 import os
 import sys
+import time
+from typing import Optional
+
+IMPORT_START = time.perf_counter()
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
-from src.data.fda_client import FDAClient
-from src.data.vector_db import HealthcareVectorDB
+from src.context import (
+    AppContext,
+    aclose_app_context,
+    close_app_context,
+    get_app_context,
+    profile_startup,
+)
+from src.pipeline import HEADINGS, print_recommendation, query_pipeline
+from src.utils.metrics import format_stages, request_trace
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_START
 
 
-async def process_query(query: str):
+async def process_query(query: str, context: Optional[AppContext] = None):
     """Process a user query and return medication recommendations"""
-    try:
-        # Initialize clients
-        vector_db = HealthcareVectorDB()
-        fda_client = FDAClient()
+    with request_trace("process_query", query=query):
+        await _process_query(query, context)
 
-        # First try vector similarity search
+
+async def _process_query(query: str, context: Optional[AppContext]):
+    try:
         print("\nSearching cached medications...")
-        similar_results = vector_db.find_similar_medications(query)
-
-        if similar_results:
-            print("\nRecommended Medications (from cache):")
-            print("-" * 50)
-            for result in similar_results:
-                medication = result[0]  # The medication data
-                similarity = result[1]  # The similarity score
-
-                print(f"\nMedication: {medication['brand_name']}")
-                print(f"Generic Name: {medication['generic_name']}")
-                print(f"Similarity Score: {similarity:.2f}")
-                print(f"Indications: {medication['indications'][:200]}...")
-                print(f"Warnings: {medication['warnings'][:200]}...")
-                print("-" * 30)
-        else:
-            # If no cached results, query FDA directly
-            print("\nNo cached results found, querying FDA API...")
-            medications = fda_client.search_medications([query])
-
-            if medications:
-                print("\nRecommended Medications (from FDA):")
-                print("-" * 50)
 
-                # Cache medications before displaying
-                for med in medications:
-                    vector_db.cache_medication(med)
+        # Print each recommendation as soon as the pipeline produces it
+        source = None
+        async for result in query_pipeline(query, context):
+            if result["source"] != source:
+                source = result["source"]
+                print(f"\n{HEADINGS[source]}")
+                print("-" * 50)
+            print_recommendation(result["medication"], result["similarity"])
 
-                    print(f"\nMedication: {med['brand_name']}")
-                    print(f"Generic Name: {med['generic_name']}")
-                    print(f"Indications: {med['indications'][:200]}...")
-                    print(f"Warnings: {med['warnings'][:200]}...")
-                    print("-" * 30)
-            else:
-                print("\nNo medications found for your query.")
+        if source is None:
+            print("\nNo medications found for your query.")
 
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -63,23 +54,56 @@ async def interactive_session():
     print("Welcome to the Healthcare Information Assistant!")
     print("Enter 'quit' to exit the program.")
 
-    while True:
-        # Get user input
-        query = input("\nPlease describe your symptoms: ").strip()
-
-        if query.lower() == "quit":
-            break
+    # Load the model, engine and FDA client once for the whole session
+    start = time.perf_counter()
+    context = get_app_context()
+    context.vector_db.warm_up()
+    print(f"Startup completed in {(time.perf_counter() - start) * 1000:.0f} ms")
 
-        # Process query and get recommendations
-        await process_query(query)
+    try:
+        while True:
+            # Get user input
+            query = input("\nPlease describe your symptoms: ").strip()
+
+            if query.lower() == "quit":
+                break
+
+            # Process query and get recommendations
+            start = time.perf_counter()
+            await process_query(query, context)
+            print(
+                f"\nQuery processed in {(time.perf_counter() - start) * 1000:.0f} ms"
+            )
+
+            print(
+                "\nDisclaimer: These recommendations are for informational purposes only."
+            )
+            print(
+                "Always consult with a healthcare professional before taking any medication."
+            )
+    finally:
+        await aclose_app_context()
+
+
+def main():
+    """Interactive medication search from the command line"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="report the time spent in each start-up phase and exit",
+    )
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        stages = [("imports", IMPORT_SECONDS)] + profile_startup()
+        close_app_context()
+        print("Startup profile:")
+        print(format_stages(stages))
+        return
 
-        print(
-            "\nDisclaimer: These recommendations are for informational purposes only."
-        )
-        print(
-            "Always consult with a healthcare professional before taking any medication."
-        )
+    asyncio.run(interactive_session())
 
 
 if __name__ == "__main__":
-    asyncio.run(interactive_session())
+    main()
@@ -0,0 +1,109 @@
+import asyncio
+import contextlib
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import quote
+
+from src.context import AppContext, get_app_context
+from src.utils.metrics import count
+
+# Heading printed before each source's recommendations
+HEADINGS = {
+    "cache": "Recommended Medications (from cache):",
+    "fda": "Recommended Medications (from FDA):",
+    "fda_unranked": "Recommended Medications (from FDA):",
+}
+
+
+def print_recommendation(medication: Dict, similarity: Optional[float]):
+    print(f"\nMedication: {medication['brand_name']}")
+    print(f"Generic Name: {medication['generic_name']}")
+    if similarity is not None:
+        print(f"Similarity Score: {similarity:.2f}")
+    if medication.get("name_score") is not None:
+        print(f"Name Match: {medication['name_score']:.2f}")
+    print(f"Indications: {medication['indications'][:200]}...")
+    print(f"Warnings: {medication['warnings'][:200]}...")
+    print("-" * 30)
+
+
+async def query_pipeline(
+    query: str, context: Optional[AppContext] = None, limit: int = 5
+) -> AsyncIterator[Dict]:
+    """Yield medication recommendations as soon as each source has them
+
+    Yields {"source": ..., "medication": ..., "similarity": ...} events,
+    where source is "cache" (vector search), "fda" (fresh OpenFDA results
+    ranked against the query in memory) or "fda_unranked" (OpenFDA
+    results none of which passed the similarity threshold, in API order).
+
+    While the cache is sparse and the cache lookup is slow to answer, the
+    OpenFDA request starts alongside it, and is cancelled if the cache
+    answers. Fresh OpenFDA results are written to the cache in the
+    background, so the caller never waits on the upsert or a second
+    vector search.
+    """
+    context = context or get_app_context()
+    vector_db = context.vector_db
+    fda_client = context.async_fda_client
+
+    def fetch_fda() -> asyncio.Task:
+        return asyncio.ensure_future(
+            fda_client.search_medications([quote(query)], limit=limit)
+        )
+
+    cache_lookup = asyncio.ensure_future(
+        asyncio.to_thread(vector_db.find_similar_medications, query, limit)
+    )
+    fda_lookup = None
+    try:
+        if await asyncio.to_thread(vector_db.is_sparse):
+            # Fast cache answers never reach OpenFDA
+            await asyncio.wait({cache_lookup}, timeout=vector_db.speculation_delay)
+            if not cache_lookup.done():
+                fda_lookup = fetch_fda()
+                count("speculative_fda_total", outcome="started")
+
+        cached = await cache_lookup
+        if cached:
+            if fda_lookup is not None and not fda_lookup.done():
+                count("speculative_fda_total", outcome="cancelled")
+            for medication, similarity in cached:
+                yield {
+                    "source": "cache",
+                    "medication": medication,
+                    "similarity": similarity,
+                }
+            return
+
+        if fda_lookup is None:
+            fda_lookup = fetch_fda()
+        medications = await fda_lookup
+        if not medications:
+            return
+
+        ranked = await asyncio.to_thread(
+            vector_db.rank_medications, query, medications, limit
+        )
+        # Embeddings were computed for ranking, so this upsert only writes
+        context.spawn(asyncio.to_thread(vector_db.cache_medications, medications))
+
+        if ranked:
+            for medication, similarity in ranked:
+                yield {
+                    "source": "fda",
+                    "medication": medication,
+                    "similarity": similarity,
+                }
+        else:
+            for medication in medications:
+                yield {
+                    "source": "fda_unranked",
+                    "medication": medication,
+                    "similarity": None,
+                }
+    finally:
+        for task in (cache_lookup, fda_lookup):
+            if task is not None and not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await task
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.data.vector_db import EMBEDDING_DIM, SIMILARITY_THRESHOLD, get_database_url
+from src.data.vector_store import PgVectorStore
+
+BENCH_TABLE = "bench.medication_cache"
+
+
+def legacy_search(engine, embedding, limit: int, threshold: float):
+    """The original f-string query with its per-search COUNT(*) calls"""
+    embedding_str = f"[{','.join(map(str, embedding))}]"
+    with engine.connect() as conn:
+        conn.execute(text(f"SELECT COUNT(*) FROM {BENCH_TABLE}")).scalar()
+        return conn.execute(
+            text(f"""
+                WITH similarity_scores AS (
+                    SELECT
+                        m.id as medication_id,
+                        m.raw_data,
+                        (1 - (m.embedding <=> '{embedding_str}'::vector)) as similarity
+                    FROM {BENCH_TABLE} m
+                    ORDER BY similarity DESC
+                    LIMIT :limit
+                )
+                SELECT medication_id, raw_data, similarity,
+                       (SELECT COUNT(*) FROM {BENCH_TABLE}) as total_meds
+                FROM similarity_scores
+                WHERE similarity > :threshold;
+            """),
+            {"threshold": threshold, "limit": limit},
+        ).fetchall()
+
+
+def build_table(engine, rows: int, chunk: int = 100000):
+    """Fill an unlogged scratch table with random vectors and index it"""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE SCHEMA IF NOT EXISTS bench"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        conn.execute(
+            text(f"""
+                CREATE UNLOGGED TABLE {BENCH_TABLE} (
+                    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+                    brand_name text,
+                    generic_name text,
+                    raw_data jsonb,
+                    summary jsonb,
+                    embedding vector({EMBEDDING_DIM})
+                )
+            """)
+        )
+
+    for start in range(0, rows, chunk):
+        with engine.begin() as conn:
+            # The correlated WHERE forces a fresh random vector per row; the
+            # summary has the keys medication_summary() writes, as searched
+            # by PgVectorStore
+            conn.execute(
+                text(f"""
+                    INSERT INTO {BENCH_TABLE}
+                        (brand_name, generic_name, raw_data, summary, embedding)
+                    SELECT
+                        'Brand ' || i,
+                        'generic ' || i,
+                        jsonb_build_object('brand_name', 'Brand ' || i),
+                        jsonb_build_object(
+                            'brand_name', 'Brand ' || i,
+                            'generic_name', 'generic ' || i,
+                            'indications', '',
+                            'warnings', ''
+                        ),
+                        (SELECT array_agg(random()::real)
+                         FROM generate_series(1, {EMBEDDING_DIM}) WHERE i > 0)::vector
+                    FROM generate_series(:start, :stop) AS i
+                """),
+                {"start": start + 1, "stop": min(start + chunk, rows)},
+            )
+
+    with engine.begin() as conn:
+        lists = max(1, rows // 1000)
+        conn.execute(
+            text(f"""
+                CREATE INDEX ON {BENCH_TABLE}
+                USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})
+            """)
+        )
+        conn.execute(text(f"ANALYZE {BENCH_TABLE}"))
+
+
+def measure(fn, queries) -> dict:
+    latencies = []
+    for embedding in queries:
+        start = time.perf_counter()
+        fn(embedding)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+    }
+
+
+def main():
+    """Compare the legacy and prepared pgvector queries at several table sizes"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the bench schema")
+    args = parser.parse_args()
+
+    load_dotenv()
+    engine = create_engine(get_database_url())
+    store = PgVectorStore(engine, table=BENCH_TABLE)
+    rng = np.random.default_rng(0)
+    report = []
+
+    try:
+        for size in args.sizes:
+            print(f"Building {size} row table...")
+            build_table(engine, size)
+            queries = rng.random((args.queries, EMBEDDING_DIM), dtype=np.float32)
+
+            # Warm up both paths so connection set-up is not measured
+            legacy_search(engine, queries[0], args.limit, SIMILARITY_THRESHOLD)
+            store.search(queries[0], args.limit, SIMILARITY_THRESHOLD)
+
+            result = {
+                "rows": size,
+                "legacy": measure(
+                    lambda q: legacy_search(engine, q, args.limit, SIMILARITY_THRESHOLD),
+                    queries,
+                ),
+                "prepared": measure(
+                    lambda q: store.search(q, args.limit, SIMILARITY_THRESHOLD), queries
+                ),
+            }
+            print(json.dumps(result))
+            report.append(result)
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text("DROP SCHEMA IF EXISTS bench CASCADE"))
+        engine.dispose()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.data.embedding_model import DEFAULT_MODEL_PATH, MODEL_NAME
+
+
+def main():
+    """Download the embedding model once and save it for offline loading"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--path",
+        default=os.getenv("EMBEDDING_MODEL_PATH", DEFAULT_MODEL_PATH),
+        help="directory to save the model to",
+    )
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    try:
+        model = SentenceTransformer(MODEL_NAME)
+        model.save(args.path)
+    except Exception as e:
+        print(f"Error downloading embedding model: {str(e)}")
+        sys.exit(1)
+    print(f"Saved {MODEL_NAME} to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
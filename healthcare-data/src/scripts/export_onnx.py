@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.benchmarks.corpus import make_corpus, make_queries
+from src.data.embedding_model import (
+    DEFAULT_ONNX_PATH,
+    ONNX_CONFIG_FILE,
+    ONNX_INT8_MODEL_FILE,
+    ONNX_MODEL_FILE,
+    OnnxEncoder,
+    encoder_parity,
+    load_model,
+)
+from src.data.vector_db import medication_text
+
+
+def export(model, directory: str, opset: int):
+    """Export the transformer of a SentenceTransformer to ONNX"""
+    import torch
+
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    class LastHiddenState(torch.nn.Module):
+        # Pooling and normalization run in OnnxEncoder, outside the graph
+        def __init__(self, module):
+            super().__init__()
+            self.module = module
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.module(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids,
+            )[0]
+
+    sample = tokenizer(
+        ["export sample", "a somewhat longer export sample"],
+        padding=True,
+        return_tensors="pt",
+    )
+    inputs = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in inputs}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    os.makedirs(directory, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            tuple(sample[name] for name in inputs),
+            os.path.join(directory, ONNX_MODEL_FILE),
+            input_names=inputs,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    tokenizer.save_pretrained(directory)
+    with open(os.path.join(directory, ONNX_CONFIG_FILE), "w") as f:
+        json.dump(
+            {
+                "dim": model.get_sentence_embedding_dimension(),
+                "max_seq_length": model.max_seq_length,
+                "pad_token": tokenizer.pad_token,
+                "pad_token_id": tokenizer.pad_token_id,
+            },
+            f,
+            indent=2,
+        )
+
+
+def quantize(directory: str):
+    """Write a dynamically int8-quantized copy of the exported model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(
+        os.path.join(directory, ONNX_MODEL_FILE),
+        os.path.join(directory, ONNX_INT8_MODEL_FILE),
+        weight_type=QuantType.QInt8,
+    )
+
+
+def main():
+    """Export all-MiniLM-L6-v2 to ONNX (plus int8) and check parity"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--path",
+        default=os.getenv("EMBEDDING_ONNX_PATH", DEFAULT_ONNX_PATH),
+        help="directory to write the ONNX export to",
+    )
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument(
+        "--no-quantize", action="store_true", help="skip the int8 model"
+    )
+    parser.add_argument(
+        "--parity-texts",
+        type=int,
+        default=500,
+        help="texts used to compare the export with the reference model",
+    )
+    parser.add_argument(
+        "--min-cosine",
+        type=float,
+        default=0.98,
+        help="fail when the mean cosine agreement falls below this",
+    )
+    args = parser.parse_args()
+
+    reference = load_model("torch", remote=False)
+    try:
+        export(reference, args.path, args.opset)
+        if not args.no_quantize:
+            quantize(args.path)
+    except Exception as e:
+        print(f"Error exporting embedding model: {str(e)}")
+        sys.exit(1)
+    print(f"Exported {args.path}")
+
+    half = args.parity_texts // 2
+    texts = [medication_text(med) for med in make_corpus(half)] + make_queries(
+        args.parity_texts - half
+    )
+    variants = (
+        {"onnx": False} if args.no_quantize else {"onnx": False, "onnx-int8": True}
+    )
+    report = {
+        name: encoder_parity(reference, OnnxEncoder(args.path, quantized), texts)
+        for name, quantized in variants.items()
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = [name for name, r in report.items() if r["mean_cosine"] < args.min_cosine]
+    if failed:
+        print(f"Parity below {args.min_cosine} for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+
+import ijson
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.data.embedding_model import load_model
+from src.data.fda_client import format_medication
+from src.data.vector_db import (
+    dedupe_medications,
+    get_database_url,
+    medication_text,
+    upsert_medications,
+)
+
+# Set in each worker process by _init_worker
+_model = None
+
+
+def _init_worker(threads: int):
+    """Load the embedding model once per worker process"""
+    global _model
+    # Keep workers from oversubscribing the CPU with intra-op threads
+    _model = load_model(threads=threads)
+
+
+def _encode_batch(texts: List[str]) -> List[List[float]]:
+    return _model.encode(texts, batch_size=len(texts)).tolist()
+
+
+def iter_labels(path: str) -> Iterator[Dict]:
+    """Stream label records from a .json or .json.zip dump partition"""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if not member.endswith(".json"):
+                    continue
+                with archive.open(member) as f:
+                    yield from ijson.items(f, "results.item")
+    else:
+        with open(path, "rb") as f:
+            yield from ijson.items(f, "results.item")
+
+
+def find_partitions(paths: List[str]) -> List[str]:
+    """Expand directories into their dump partition files"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.json.zip"))))
+            files.extend(sorted(glob.glob(os.path.join(path, "*.json"))))
+        else:
+            files.append(path)
+    return files
+
+
+def load_checkpoint(path: str) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write then rename so an interrupted run never leaves a torn file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def has_names(label: Dict) -> bool:
+    """Whether the label's openfda block gives both a brand and generic name"""
+    openfda = label.get("openfda") or {}
+    return bool(openfda.get("brand_name")) and bool(openfda.get("generic_name"))
+
+
+def load_chunk(engine, pool, labels: List[Dict], batch_size: int) -> Dict:
+    """Embed a chunk of labels across the pool and upsert it in one transaction
+
+    Labels without openfda names are skipped; format_medication would name
+    them all "Unknown" and they would overwrite each other in one row.
+    """
+    named = [label for label in labels if has_names(label)]
+    medications, skipped = dedupe_medications(
+        [format_medication(label) for label in named]
+    )
+    skipped += len(labels) - len(named)
+    texts = [medication_text(med) for med in medications]
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    embeddings = []
+    for batch in pool.map(_encode_batch, batches):
+        embeddings.extend(batch)
+
+    with engine.begin() as conn:
+        counts = upsert_medications(conn, medications, embeddings)
+    counts["skipped"] = skipped
+    return counts
+
+
+def _report(totals: Dict, counts: Dict, labels: int, start: float):
+    totals["labels"] += labels
+    for key in ("inserted", "updated", "skipped"):
+        totals[key] += counts[key]
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {totals['labels']} labels "
+        f"({counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['skipped']} skipped) - {totals['labels'] / elapsed:.1f} labels/s"
+    )
+
+
+def load_partitions(
+    files: List[str],
+    checkpoint_path: str,
+    chunk_size: int,
+    batch_size: int,
+    workers: int,
+) -> Dict:
+    """Load dump partitions, resuming from and updating the checkpoint"""
+    engine = create_engine(get_database_url())
+    checkpoint = load_checkpoint(checkpoint_path)
+    totals = {"labels": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(threads,)
+    ) as pool:
+        for path in files:
+            name = os.path.basename(path)
+            progress = checkpoint["files"].setdefault(name, {"offset": 0, "done": False})
+            if progress["done"]:
+                print(f"Skipping {name} (already loaded)")
+                continue
+
+            print(f"Loading {name} from record {progress['offset']}...")
+            chunk = []
+            for index, label in enumerate(iter_labels(path)):
+                if index < progress["offset"]:
+                    continue
+                chunk.append(label)
+                if len(chunk) < chunk_size:
+                    continue
+
+                counts = load_chunk(engine, pool, chunk, batch_size)
+                progress["offset"] = index + 1
+                save_checkpoint(checkpoint_path, checkpoint)
+                _report(totals, counts, len(chunk), start)
+                chunk = []
+
+            if chunk:
+                counts = load_chunk(engine, pool, chunk, batch_size)
+                _report(totals, counts, len(chunk), start)
+            progress["offset"] = 0
+            progress["done"] = True
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    engine.dispose()
+    elapsed = time.perf_counter() - start
+    totals["seconds"] = round(elapsed, 2)
+    totals["labels_per_second"] = round(totals["labels"] / elapsed, 1) if elapsed else 0.0
+    return totals
+
+
+def main():
+    """Load openFDA drug label dump files into health.medication_cache"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "paths", nargs="+", help="drug-label-*.json.zip files or directories"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=".cache/label_loader_checkpoint.json",
+        help="progress file used to resume interrupted loads",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=5000, help="labels per transaction"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=256, help="texts per encode call"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="encoder processes"
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    files = find_partitions(args.paths)
+    if not files:
+        print("No label dump files found")
+        sys.exit(1)
+
+    try:
+        totals = load_partitions(
+            files, args.checkpoint, args.chunk_size, args.batch_size, args.workers
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume from the checkpoint")
+        sys.exit(1)
+
+    print("\nLoad complete:")
+    print(json.dumps(totals, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.data.history_store import daily_stats, maintain_history, top_medications
+from src.data.vector_db import get_database_url
+
+
+def main():
+    """Partition, roll up and expire query history and search results"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        default=int(os.getenv("HISTORY_RETENTION_DAYS", "90")),
+        help="drop history partitions older than this; rollups are kept",
+    )
+    parser.add_argument(
+        "--days-ahead",
+        type=int,
+        default=int(os.getenv("HISTORY_PARTITION_DAYS_AHEAD", "7")),
+        help="create daily partitions this many days in advance",
+    )
+    parser.add_argument(
+        "--report",
+        type=int,
+        metavar="DAYS",
+        help="also print daily stats and top medications for the last DAYS days",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine(get_database_url())
+    try:
+        report = maintain_history(engine, args.retention_days, args.days_ahead)
+        if args.report:
+            with engine.connect() as conn:
+                report["daily"] = daily_stats(conn, args.report)
+                report["top_medications"] = top_medications(conn, args.report, args.top)
+    except Exception as e:
+        print(f"Error maintaining query history: {str(e)}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
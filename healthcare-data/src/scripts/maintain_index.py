@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.data.ann_index import STORAGE, ensure_index, session_settings
+from src.data.vector_db import get_database_url
+
+
+def main():
+    """Create or rebuild the medication embedding index for the current row count"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--type",
+        choices=["ivfflat", "hnsw"],
+        default=os.getenv("ANN_INDEX_TYPE", "ivfflat"),
+        help="index method to build",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=list(STORAGE),
+        default=os.getenv("ANN_STORAGE", "vector"),
+        help="index full vectors, or halfvec / bit casts that search re-ranks",
+    )
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        default=1000,
+        help="below this many rows no ANN index is built",
+    )
+    parser.add_argument(
+        "--recall-target",
+        type=float,
+        default=float(os.getenv("ANN_RECALL_TARGET", "0.95")),
+        help="target recall used to pick ivfflat.probes / hnsw.ef_search",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rebuild even if the index fits"
+    )
+    args = parser.parse_args()
+
+    engine = create_engine(get_database_url())
+    try:
+        report = ensure_index(
+            engine, args.type, args.min_rows, args.force, args.storage
+        )
+    except Exception as e:
+        print(f"Error maintaining embedding index: {str(e)}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+    index = report["planned"] if report["action"] != "none" else report["current"]
+    report["session_settings"] = session_settings(index, args.recall_target)
+    print(json.dumps(report, indent=2))
+    if report["action"] != "none":
+        print("Restart running services to pick up the new search settings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.sql import text
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.benchmarks.run import percentile
+from src.data.ann_index import INDEX_NAME, STORAGE, TABLE, column_type, ensure_index
+from src.data.embedding_model import EMBEDDING_DIM
+from src.data.history_store import EMBEDDING_INDEX, set_embedding_index
+from src.data.vector_db import get_database_url
+from src.data.vector_store import create_vector_store
+
+HISTORY_TABLE = "health.query_history"
+HISTORY_INDEX = EMBEDDING_INDEX
+
+
+def storage_sizes(engine) -> Dict:
+    """On-disk bytes of each table, its indexes and its embedding index
+
+    Partitioned tables and indexes are summed over their partitions.
+    """
+    sizes = {}
+    with engine.connect() as conn:
+        for table, index in [(TABLE, INDEX_NAME), (HISTORY_TABLE, HISTORY_INDEX)]:
+            sizes[table] = dict(
+                conn.execute(
+                    text(
+                        "SELECT sum(pg_table_size(relid))::bigint AS table_bytes,"
+                        " sum(pg_indexes_size(relid))::bigint AS indexes_bytes,"
+                        " (SELECT COALESCE(sum(pg_relation_size(relid)), 0)::bigint"
+                        " FROM pg_partition_tree(to_regclass(:index)))"
+                        " AS embedding_index_bytes"
+                        " FROM pg_partition_tree(CAST(:table AS regclass))"
+                    ),
+                    {"table": table, "index": f"health.{index}"},
+                )
+                .mappings()
+                .one()
+            )
+            sizes[table]["embedding_type"] = column_type(conn, table)
+    return sizes
+
+
+def sample_queries(engine, samples: int) -> List[str]:
+    """Recent query embeddings, or medication embeddings when there are none"""
+    with engine.connect() as conn:
+        for table in [HISTORY_TABLE, TABLE]:
+            rows = conn.execute(
+                text(
+                    f"SELECT embedding::vector::text FROM {table} "
+                    "WHERE embedding IS NOT NULL ORDER BY random() LIMIT :samples"
+                ),
+                {"samples": samples},
+            ).fetchall()
+            if rows:
+                return [row[0] for row in rows]
+    return []
+
+
+def exact_top_k(engine, embedding: str, k: int) -> List[str]:
+    """Ground-truth neighbours from a full scan of the exact vectors"""
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL enable_indexscan = off"))
+        conn.execute(text("SET LOCAL enable_bitmapscan = off"))
+        rows = conn.execute(
+            text(
+                f"SELECT id FROM {TABLE} "
+                "ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :k"
+            ),
+            {"embedding": embedding, "k": k},
+        ).fetchall()
+    return [str(row[0]) for row in rows]
+
+
+def evaluate(engine, queries: List[str], k: int) -> Dict:
+    """Recall@k and latency of the search the app would run right now"""
+    store = create_vector_store(EMBEDDING_DIM, engine, "pgvector")
+    recalls = []
+    latencies = []
+    for embedding in queries:
+        vector = json.loads(embedding)
+        truth = set(exact_top_k(engine, embedding, k))
+        start = time.perf_counter()
+        hits = store.search(vector, k, -1.0)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {str(medication_id) for medication_id, _, _ in hits}
+        recalls.append(len(found & truth) / len(truth) if truth else 1.0)
+    latencies.sort()
+    store.close()
+    return {
+        "storage": store.storage,
+        "rerank_factor": store.rerank_factor,
+        "samples": len(queries),
+        f"recall_at_{k}": round(sum(recalls) / len(recalls), 4) if recalls else None,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+    }
+
+
+def convert_history(engine) -> bool:
+    """Store query_history embeddings as halfvec, rebuilding their index
+
+    Query history only feeds near-duplicate lookups, where half precision
+    is plenty, so its full vectors are not kept. Rewrites every partition
+    under an exclusive lock; analytics writes queue up until it finishes.
+    The index is rebuilt only if HISTORY_EMBEDDING_INDEX asks for one.
+    """
+    with engine.begin() as conn:
+        if not (column_type(conn, HISTORY_TABLE) or "").startswith("vector"):
+            return False
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        conn.execute(text(f"DROP INDEX IF EXISTS health.{HISTORY_INDEX}"))
+        conn.execute(
+            text(
+                f"ALTER TABLE {HISTORY_TABLE} ALTER COLUMN embedding "
+                f"TYPE halfvec({EMBEDDING_DIM}) "
+                f"USING embedding::halfvec({EMBEDDING_DIM})"
+            )
+        )
+        set_embedding_index(
+            conn, os.getenv("HISTORY_EMBEDDING_INDEX", "none"), HISTORY_TABLE
+        )
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM ANALYZE {HISTORY_TABLE}"))
+    return True
+
+
+def main():
+    """Switch the embedding index to compact storage and report the effect"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--storage",
+        choices=list(STORAGE),
+        default=os.getenv("ANN_STORAGE", "halfvec"),
+        help="how the medication index stores embeddings",
+    )
+    parser.add_argument(
+        "--type",
+        choices=["ivfflat", "hnsw"],
+        default=os.getenv("ANN_INDEX_TYPE", "ivfflat"),
+    )
+    parser.add_argument("--min-rows", type=int, default=1000)
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="also convert query_history embeddings to halfvec",
+    )
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--report-only", action="store_true", help="measure without migrating"
+    )
+    args = parser.parse_args()
+
+    engine = create_engine(get_database_url())
+    try:
+        queries = sample_queries(engine, args.samples)
+        report = {
+            "before": {
+                "sizes": storage_sizes(engine),
+                "search": evaluate(engine, queries, args.k),
+            }
+        }
+        if not args.report_only:
+            report["index"] = ensure_index(
+                engine, args.type, args.min_rows, storage=args.storage
+            )
+            if args.history:
+                report["history_converted"] = convert_history(engine)
+            report["after"] = {
+                "sizes": storage_sizes(engine),
+                "search": evaluate(engine, queries, args.k),
+            }
+    except Exception as e:
+        print(f"Error migrating embedding storage: {str(e)}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+    print(json.dumps(report, indent=2, default=str))
+    if not args.report_only:
+        print("Restart running services to search with the new index")
+
+
+if __name__ == "__main__":
+    main()
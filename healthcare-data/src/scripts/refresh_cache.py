@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+from sqlalchemy.sql import text
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.context import AppContext, aclose_app_context, get_app_context
+from src.data.fda_client import format_medication
+from src.scripts.load_labels import save_checkpoint
+
+JOBS = ["refresh", "prewarm"]
+
+# Start of a refresh pass: before every (updated_at, id)
+FIRST_CURSOR = {
+    "updated_at": datetime.min.isoformat(),
+    "id": "00000000-0000-0000-0000-000000000000",
+}
+
+
+def load_checkpoint(path: str) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def ensure_refresh_index(engine):
+    """Index the stale-row scan; built concurrently so searches keep running"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(
+            text(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+                "idx_medication_cache_updated_at "
+                "ON health.medication_cache (updated_at, id)"
+            )
+        )
+
+
+def stale_batch(engine, cutoff: datetime, cursor: Dict, size: int) -> List:
+    with engine.connect() as conn:
+        return conn.execute(
+            text("""
+                SELECT id, brand_name, generic_name, updated_at
+                FROM health.medication_cache
+                WHERE updated_at < :cutoff
+                  AND (updated_at, id) > (:after_updated_at, CAST(:after_id AS uuid))
+                ORDER BY updated_at, id
+                LIMIT :size
+            """),
+            {
+                "cutoff": cutoff,
+                "after_updated_at": datetime.fromisoformat(cursor["updated_at"]),
+                "after_id": cursor["id"],
+                "size": size,
+            },
+        ).fetchall()
+
+
+async def refresh_stale(
+    context: AppContext,
+    checkpoint: Dict,
+    checkpoint_path: str,
+    ttl: float,
+    batch_size: int,
+    pause: float,
+    max_batches: int,
+) -> Dict:
+    """Re-fetch and re-embed medications not updated within ttl seconds
+
+    A pass covers the rows that were stale when it started, in
+    (updated_at, id) order. The cursor is checkpointed after every batch,
+    so an interrupted pass resumes where it stopped, and rows OpenFDA no
+    longer returns are skipped rather than retried until the next pass.
+    """
+    vector_db = context.vector_db
+    progress = checkpoint.get("refresh")
+    if not progress or progress.get("done"):
+        progress = checkpoint["refresh"] = {
+            "cutoff": (datetime.now() - timedelta(seconds=ttl)).isoformat(),
+            "cursor": dict(FIRST_CURSOR),
+            "done": False,
+        }
+    cutoff = datetime.fromisoformat(progress["cutoff"])
+    totals = {"checked": 0, "refreshed": 0, "missing": 0}
+
+    for _ in range(max_batches):
+        rows = await asyncio.to_thread(
+            stale_batch, vector_db.engine, cutoff, progress["cursor"], batch_size
+        )
+        if not rows:
+            progress["done"] = True
+            break
+
+        # The client's token bucket keeps these within the OpenFDA quota
+        labels = await asyncio.gather(
+            *(
+                context.async_fda_client.get_label(brand_name, fresh=True)
+                for _, brand_name, _, _ in rows
+            )
+        )
+        medications = []
+        for (_, brand_name, generic_name, _), label in zip(rows, labels):
+            medication = format_medication(label) if label else None
+            # A label under other names would be cached as a new medication
+            if medication and (
+                medication["brand_name"].lower(),
+                medication["generic_name"].lower(),
+            ) == (brand_name.lower(), generic_name.lower()):
+                medication["brand_name"] = brand_name
+                medication["generic_name"] = generic_name
+                medications.append(medication)
+            else:
+                totals["missing"] += 1
+
+        if medications:
+            counts = await asyncio.to_thread(vector_db.cache_medications, medications)
+            totals["refreshed"] += counts["updated"] + counts["inserted"]
+        totals["checked"] += len(rows)
+
+        last_id, _, _, last_updated_at = rows[-1]
+        progress["cursor"] = {
+            "updated_at": last_updated_at.isoformat(),
+            "id": str(last_id),
+        }
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(
+            f"  refresh: {totals['checked']} checked, "
+            f"{totals['refreshed']} refreshed, {totals['missing']} not found"
+        )
+        await asyncio.sleep(pause)
+
+    save_checkpoint(checkpoint_path, checkpoint)
+    totals["pass_complete"] = progress["done"]
+    return totals
+
+
+def popular_misses(
+    engine, window: float, max_results: int, min_searches: int, limit: int
+) -> List:
+    """Frequent recent queries that returned few or no medications"""
+    with engine.connect() as conn:
+        return conn.execute(
+            text("""
+                SELECT lower(query_text) AS query, count(*) AS searches
+                FROM health.query_history
+                WHERE created_at >= :since
+                  AND coalesce(results_count, 0) <= :max_results
+                GROUP BY lower(query_text)
+                HAVING count(*) >= :min_searches
+                ORDER BY searches DESC
+                LIMIT :limit
+            """),
+            {
+                "since": datetime.now() - timedelta(seconds=window),
+                "max_results": max_results,
+                "min_searches": min_searches,
+                "limit": limit,
+            },
+        ).fetchall()
+
+
+async def prewarm(
+    context: AppContext,
+    checkpoint: Dict,
+    checkpoint_path: str,
+    window: float,
+    max_results: int,
+    min_searches: int,
+    limit: int,
+    prewarm_ttl: float,
+    pause: float,
+) -> Dict:
+    """Fetch and cache medications for popular queries the cache misses
+
+    Queries prefetched within prewarm_ttl seconds are skipped, so a
+    restarted run continues with the ones it has not reached yet.
+    """
+    vector_db = context.vector_db
+    progress = checkpoint.setdefault("prewarm", {"queries": {}})
+    now = time.time()
+    done = {
+        query: at for query, at in progress["queries"].items() if now - at < prewarm_ttl
+    }
+    progress["queries"] = done
+
+    candidates = await asyncio.to_thread(
+        popular_misses, vector_db.engine, window, max_results, min_searches, limit
+    )
+    totals = {"candidates": len(candidates), "prefetched": 0, "cached": 0}
+    for query, searches in candidates:
+        if query in done:
+            continue
+        medications = await context.async_fda_client.search_medications(
+            [quote(query)], limit=5
+        )
+        if medications:
+            counts = await asyncio.to_thread(vector_db.cache_medications, medications)
+            totals["cached"] += counts["inserted"] + counts["updated"]
+        totals["prefetched"] += 1
+        done[query] = time.time()
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(f"  prewarm: {query!r} ({searches} searches) -> {len(medications)}")
+        await asyncio.sleep(pause)
+
+    save_checkpoint(checkpoint_path, checkpoint)
+    return totals
+
+
+async def run(args) -> Dict:
+    context = get_app_context()
+    await asyncio.to_thread(ensure_refresh_index, context.vector_db.engine)
+    checkpoint = load_checkpoint(args.checkpoint)
+    try:
+        while True:
+            report = {}
+            if "refresh" in args.jobs:
+                print("Refreshing stale medications...")
+                report["refresh"] = await refresh_stale(
+                    context,
+                    checkpoint,
+                    args.checkpoint,
+                    args.ttl,
+                    args.batch_size,
+                    args.pause,
+                    args.max_batches,
+                )
+            if "prewarm" in args.jobs:
+                print("Prewarming popular cache misses...")
+                report["prewarm"] = await prewarm(
+                    context,
+                    checkpoint,
+                    args.checkpoint,
+                    args.window,
+                    args.max_results,
+                    args.min_searches,
+                    args.prewarm_limit,
+                    args.prewarm_ttl,
+                    args.pause,
+                )
+            print(json.dumps(report, indent=2))
+            if not args.loop:
+                return report
+            await asyncio.sleep(args.interval)
+    finally:
+        await aclose_app_context()
+
+
+def main():
+    """Refresh stale cached medications and prewarm popular cache misses"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--jobs", nargs="+", choices=JOBS, default=JOBS)
+    parser.add_argument(
+        "--checkpoint",
+        default=".cache/refresh_checkpoint.json",
+        help="progress file used to resume interrupted runs",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=float,
+        default=float(os.getenv("MEDICATION_CACHE_TTL", "2592000")),
+        help="refresh medications not updated for this many seconds",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=50, help="medications per refresh batch"
+    )
+    parser.add_argument(
+        "--max-batches",
+        type=int,
+        default=100,
+        help="refresh batches per run; the rest wait for the next run",
+    )
+    parser.add_argument(
+        "--pause", type=float, default=1.0, help="seconds to wait between batches"
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=7 * 86400,
+        help="seconds of query history to mine for cache misses",
+    )
+    parser.add_argument(
+        "--max-results",
+        type=int,
+        default=1,
+        help="queries returning at most this many results count as misses",
+    )
+    parser.add_argument("--min-searches", type=int, default=3)
+    parser.add_argument("--prewarm-limit", type=int, default=100)
+    parser.add_argument(
+        "--prewarm-ttl",
+        type=float,
+        default=86400,
+        help="do not prefetch the same query again within this many seconds",
+    )
+    parser.add_argument(
+        "--loop", action="store_true", help="keep running every --interval seconds"
+    )
+    parser.add_argument("--interval", type=float, default=3600)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume from the checkpoint")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
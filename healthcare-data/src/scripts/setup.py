@@ -10,7 +10,8 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from src.data.vector_db import Base
+from src.data.ann_index import ensure_index
+from src.data.vector_db import create_tables
 
 
 def check_postgres_connection():
@@ -124,16 +125,6 @@ def setup_vector_database():
             """)
             )
 
-            # Create indexes
-            print("Creating indexes...")
-            conn.execute(
-                text("""
-                CREATE INDEX IF NOT EXISTS idx_medication_cache_embedding 
-                ON health.medication_cache USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100);  -- Adjust based on your data size
-            """)
-            )
-
             # Verify function exists
             print("Verifying setup...")
             result = conn.execute(
@@ -153,8 +144,16 @@ def setup_vector_database():
 
         # Create tables using SQLAlchemy ORM
         print("Creating tables...")
-        Base.metadata.schema = "health"
-        Base.metadata.create_all(engine)
+        create_tables(engine)
+
+        # Size the embedding index to the data; skipped while the table is small
+        print("Creating indexes...")
+        report = ensure_index(
+            engine,
+            os.getenv("ANN_INDEX_TYPE", "ivfflat"),
+            storage=os.getenv("ANN_STORAGE", "vector"),
+        )
+        print(f"Embedding index: {report['action']} ({report['rows']} rows)")
 
         print("Database setup complete")
         return True
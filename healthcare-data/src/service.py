@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.context import AppContext, aclose_app_context, get_app_context
+from src.data.embedding_batcher import EmbeddingBatcher
+from src.data.interaction_store import find_mentions
+from src.utils.metrics import REGISTRY, request_trace
+
+MAX_LIMIT = 20
+MAX_DRUGS = 50
+
+
+class SearchService:
+    """Medication search and interaction lookup shared by all HTTP requests
+
+    Query embeddings go through an EmbeddingBatcher so concurrent requests
+    share one model.encode call. Database work runs in worker threads so
+    the event loop keeps serving other requests.
+    """
+
+    def __init__(
+        self,
+        context: AppContext,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+    ):
+        self.context = context
+        self.batcher = EmbeddingBatcher(
+            context.vector_db.generate_embeddings,
+            max_batch_size=max_batch_size or int(os.getenv("EMBED_BATCH_SIZE", "32")),
+            max_wait_ms=max_wait_ms
+            if max_wait_ms is not None
+            else float(os.getenv("EMBED_BATCH_WAIT_MS", "5")),
+        )
+
+    async def search(self, query: str, limit: int = 5) -> Dict:
+        """Search cached medications, falling back to OpenFDA like process_query"""
+        vector_db = self.context.vector_db
+        # Exact drug names are answered from the name indexes without
+        # embedding; near ones are merged into the vector results
+        results, name_hits = await asyncio.to_thread(
+            vector_db.find_by_name, query, limit
+        )
+        if results:
+            return {"query": query, "source": "name", "results": _hits(results)}
+
+        embedding = await self.batcher.embed(query)
+        results = await asyncio.to_thread(
+            vector_db.find_similar_medications,
+            query,
+            limit,
+            embedding,
+            False,
+            name_hits,
+        )
+        if results:
+            return {"query": query, "source": "cache", "results": _hits(results)}
+
+        medications = await self.context.async_fda_client.search_medications(
+            [quote(query)], limit=limit
+        )
+        if not medications:
+            return {"query": query, "source": "fda", "results": []}
+
+        # Rank in memory like query_pipeline; the upsert runs in the background
+        results = await asyncio.to_thread(
+            vector_db.rank_medications, query, medications, limit
+        )
+        self.context.spawn(asyncio.to_thread(vector_db.cache_medications, medications))
+        if results:
+            return {"query": query, "source": "fda", "results": _hits(results)}
+        return {"query": query, "source": "fda", "results": medications}
+
+    async def details(self, medication_id: str) -> Optional[Dict]:
+        """Full label for a search result, which only carries a summary"""
+        details = await asyncio.to_thread(
+            self.context.vector_db.get_medication_details, [medication_id]
+        )
+        return details.get(medication_id)
+
+    async def interactions(self, drug: str) -> Dict:
+        interactions = await asyncio.to_thread(
+            self.context.vector_db.cached_interactions, drug
+        )
+        if interactions:
+            return {"drug": drug, "source": "cache", "interactions": interactions}
+        interactions = await self.context.async_fda_client.get_drug_interactions(drug)
+        return {"drug": drug, "source": "fda", "interactions": interactions}
+
+    async def check_interactions(self, drugs: List[str]) -> Dict:
+        """Interactions for a whole regimen, fetching only cache misses"""
+        cached = await asyncio.to_thread(
+            self.context.vector_db.check_interactions, drugs
+        )
+        interactions = dict(cached["interactions"])
+        aliases = dict(cached["aliases"])
+        sources = {drug: "cache" for drug in interactions}
+        if cached["missing"]:
+            fetched = await self.context.async_fda_client.get_drug_interactions_many(
+                cached["missing"]
+            )
+            interactions.update(fetched)
+            for drug in fetched:
+                aliases[drug] = {drug}
+                sources[drug] = "fda"
+        return {
+            "drugs": drugs,
+            "interactions": interactions,
+            "sources": sources,
+            "mentions": find_mentions(interactions, aliases),
+        }
+
+    async def close(self):
+        await self.batcher.close()
+
+
+def _hits(results) -> list:
+    return [
+        {
+            **medication,
+            "similarity": round(similarity, 4) if similarity is not None else None,
+        }
+        for medication, similarity in results
+    ]
+
+
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    # Lets the React front end call the service from another origin
+    if request.method == "OPTIONS":
+        response = web.Response()
+    else:
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            response = e
+    response.headers["Access-Control-Allow-Origin"] = request.app["cors_origin"]
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    return response
+
+
+async def handle_search(request: web.Request) -> web.Response:
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body must be JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="Request body must be a JSON object")
+    else:
+        body = request.query
+
+    query = str(body.get("query") or body.get("q") or "").strip()
+    if not query:
+        raise web.HTTPBadRequest(text="Missing query")
+    try:
+        limit = min(max(int(body.get("limit", 5)), 1), MAX_LIMIT)
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(text="limit must be an integer")
+
+    with request_trace("http_search", query=query):
+        result = await request.app["service"].search(query, limit)
+    return web.json_response(result)
+
+
+async def handle_medication(request: web.Request) -> web.Response:
+    try:
+        medication_id = str(uuid.UUID(request.match_info["medication_id"]))
+    except ValueError:
+        raise web.HTTPBadRequest(text="Invalid medication id")
+    details = await request.app["service"].details(medication_id)
+    if details is None:
+        raise web.HTTPNotFound(text="Unknown medication id")
+    return web.json_response({"id": medication_id, **details})
+
+
+async def handle_interactions(request: web.Request) -> web.Response:
+    drug = request.query.get("drug", "").strip()
+    if not drug:
+        raise web.HTTPBadRequest(text="Missing drug")
+    with request_trace("http_interactions", drug=drug):
+        result = await request.app["service"].interactions(drug)
+    return web.json_response(result)
+
+
+async def handle_check_interactions(request: web.Request) -> web.Response:
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body must be JSON")
+        drugs = body.get("drugs") if isinstance(body, dict) else None
+        if not isinstance(drugs, list):
+            raise web.HTTPBadRequest(text="drugs must be a list")
+    else:
+        drugs = request.query.get("drugs", "").split(",")
+
+    drugs = list(dict.fromkeys(str(drug).strip() for drug in drugs if drug))
+    drugs = [drug for drug in drugs if drug]
+    if not drugs:
+        raise web.HTTPBadRequest(text="Missing drugs")
+    if len(drugs) > MAX_DRUGS:
+        raise web.HTTPBadRequest(text=f"At most {MAX_DRUGS} drugs per request")
+
+    with request_trace("http_check_interactions", drugs=len(drugs)):
+        result = await request.app["service"].check_interactions(drugs)
+    return web.json_response(result)
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        text=REGISTRY.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def on_startup(app: web.Application):
+    # Model load and schema setup block, so keep them off the event loop
+    context = await asyncio.to_thread(get_app_context)
+    await asyncio.to_thread(context.vector_db.warm_up)
+    app["service"] = SearchService(context)
+
+
+async def on_cleanup(app: web.Application):
+    await app["service"].close()
+    await aclose_app_context()
+
+
+def create_app() -> web.Application:
+    """Build the aiohttp application exposing search and interactions"""
+    app = web.Application(middlewares=[cors_middleware])
+    app["cors_origin"] = os.getenv("SERVICE_CORS_ORIGIN", "http://localhost:3000")
+    app.router.add_get("/search", handle_search)
+    app.router.add_post("/search", handle_search)
+    app.router.add_get("/medications/{medication_id}", handle_medication)
+    app.router.add_get("/interactions", handle_interactions)
+    app.router.add_get("/interactions/check", handle_check_interactions)
+    app.router.add_post("/interactions/check", handle_check_interactions)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    """Serve medication search and interaction lookup over HTTP"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("SERVICE_PORT", "8000"))
+    )
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,23 @@ import logging
 import os
 from datetime import datetime
 
-def setup_logger(name):
+def setup_logger(name, level=logging.INFO):
     # Create logs directory if it doesn't exist
     if not os.path.exists('logs'):
         os.makedirs('logs')
         
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level)
+
+    # Configuring the same logger twice would duplicate every line
+    if logger.handlers:
+        return logger
     
     # Create file handler
     fh = logging.FileHandler(
         f'logs/{name}_{datetime.now().strftime("%Y%m%d")}.log'
     )
-    fh.setLevel(logging.INFO)
+    fh.setLevel(level)
     
     # Create formatter
     formatter = logging.Formatter(
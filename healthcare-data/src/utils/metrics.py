@@ -0,0 +1,241 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+PREFIX = "healthcare"
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow FDA calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Kept outside the "src" hierarchy so app logging does not switch tracing on
+trace_logger = logging.getLogger("trace")
+
+# Stage timings collected for the request currently being traced
+_current_trace: contextvars.ContextVar = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms in Prometheus text format"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = _key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}_{name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{PREFIX}_{name}{_labels(labels)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}_{name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        bucket = labels + (("le", str(bound)),)
+                        lines.append(f"{PREFIX}_{name}_bucket{_labels(bucket)} {count}")
+                    bucket = labels + (("le", "+Inf"),)
+                    lines.append(
+                        f"{PREFIX}_{name}_bucket{_labels(bucket)} {histogram.count}"
+                    )
+                    lines.append(
+                        f"{PREFIX}_{name}_sum{_labels(labels)} {histogram.total}"
+                    )
+                    lines.append(
+                        f"{PREFIX}_{name}_count{_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+def _key(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def count(name: str, amount: float = 1, **labels):
+    """Increment a counter in the process-wide registry"""
+    REGISTRY.inc(name, amount, **labels)
+
+
+def cache_event(cache: str, result: str):
+    """Count a cache lookup outcome (hit, miss, stale, ...)"""
+    REGISTRY.inc("cache_events_total", cache=cache, result=result)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record how long the block takes as a stage latency"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe("stage_seconds", elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+@contextmanager
+def request_trace(kind: str, **fields):
+    """Collect stage timings for one request and log them when it finishes
+
+    Trace lines are only emitted when the "trace" logger is enabled for
+    INFO, so tracing costs nothing when it is switched off.
+    """
+    if not trace_logger.isEnabledFor(logging.INFO):
+        yield
+        return
+
+    trace: List[Tuple[str, float]] = []
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        stages = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in trace)
+        details = " ".join(f"{key}={value!r}" for key, value in fields.items())
+        trace_logger.info(
+            "trace id=%s kind=%s total=%.1fms %s %s",
+            uuid.uuid4().hex[:12],
+            kind,
+            total_ms,
+            stages,
+            details,
+        )
+
+
+@contextmanager
+def collect_stages():
+    """Collect the (stage, seconds) of every timed() block run inside"""
+    stages: List[Tuple[str, float]] = []
+    token = _current_trace.set(stages)
+    try:
+        yield stages
+    finally:
+        _current_trace.reset(token)
+
+
+def format_stages(stages: List[Tuple[str, float]]) -> str:
+    """Format stage timings as an aligned table with a total"""
+    width = max([len(stage) for stage, _ in stages] + [len("total")])
+    lines = [
+        f"  {stage:<{width}}  {seconds * 1000:9.1f} ms" for stage, seconds in stages
+    ]
+    total = sum(seconds for _, seconds in stages)
+    lines.append(f"  {'total':<{width}}  {total * 1000:9.1f} ms")
+    return "\n".join(lines)
+
+
+def write_metrics(path: str):
+    """Write the current metrics to a file for node-exporter style scraping"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(REGISTRY.render())
+    # Rename so scrapers never read a half-written file
+    os.replace(tmp_path, path)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics in Prometheus text format from a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stop_metrics_server(server: Optional[ThreadingHTTPServer]):
+    if server is not None:
+        server.shutdown()
+        server.server_close()